@@ -1,3 +1,4 @@
+from concurrent.futures import ProcessPoolExecutor
 import copy
 import json
 from pathlib import Path
@@ -13,7 +14,13 @@ from ruamel.yaml.scalarstring import LiteralScalarString
 from cipher_parse.geometry import CIPHERGeometry
 from cipher_parse.interface import InterfaceDefinition
 from cipher_parse.material import MaterialDefinition
-from cipher_parse.utilities import set_by_path, read_shockley, grain_boundary_mobility
+from cipher_parse.utilities import (
+    set_by_path,
+    read_shockley,
+    grain_boundary_mobility,
+    get_fingerprint,
+    to_smallest_int_dtype,
+)
 
 
 def compress_1D_array(arr):
@@ -60,6 +67,19 @@ def decompress_1D_array_string(arr_str, item_delim="\n"):
     return np.array(out)
 
 
+def _write_random_voronoi_realization(path, file_format, random_seed, kwargs):
+    """Generate a random Voronoi input and write it to a file. Module-level, so it can
+    be run on a process pool."""
+    # material and interface definitions are modified by the geometry, so copy them:
+    kwargs = copy.deepcopy(kwargs)
+    inp = CIPHERInput.from_random_voronoi(**kwargs, random_seed=random_seed)
+    if file_format == "yaml":
+        inp.write_yaml(path)
+    else:
+        inp.to_JSON_file(path)
+    return inp.fingerprint
+
+
 @dataclass
 class CIPHERInput:
     geometry: CIPHERGeometry
@@ -70,8 +90,11 @@ class CIPHERInput:
 
     def __post_init__(self):
         self._validate()
+        self._fingerprint = None  # assigned on first access of `fingerprint`
 
     def __eq__(self, other):
+        if self is other:
+            return True
         if not isinstance(other, self.__class__):
             return False
         if (
@@ -83,6 +106,29 @@ class CIPHERInput:
             return True
         return False
 
+    @property
+    def fingerprint(self):
+        """Get a content hash of the input, combining the geometry fingerprint with the
+        components, outputs and solution parameters.
+
+        The value is cached, and recomputed only if the geometry fingerprint changes;
+        in-place edits of the components, outputs or solution parameters are not
+        tracked.
+
+        """
+        geometry_fingerprint = self.geometry.fingerprint
+        if self._fingerprint is None or self._fingerprint[0] != geometry_fingerprint:
+            self._fingerprint = (
+                geometry_fingerprint,
+                get_fingerprint(
+                    geometry_fingerprint,
+                    self.components,
+                    self.outputs,
+                    self.solution_parameters,
+                ),
+            )
+        return self._fingerprint[1]
+
     def _validate(self):
         check_grid_size = (
             np.array(self.solution_parameters["initblocksize"])
@@ -158,7 +204,7 @@ class CIPHERInput:
         num_phases = header["n_phases"]
 
         voxel_phase = decompress_1D_array_string(data["mappings"]["voxel_phase_mapping"])
-        voxel_phase = voxel_phase.reshape(grid_size, order="F") - 1
+        voxel_phase = to_smallest_int_dtype(voxel_phase.reshape(grid_size, order="F") - 1)
 
         unique_phase_IDs = np.unique(voxel_phase)
         assert len(unique_phase_IDs) == num_phases
@@ -329,6 +375,113 @@ class CIPHERInput:
             is_periodic=is_periodic,
         )
 
+    @classmethod
+    def write_random_voronoi_ensemble(
+        cls,
+        dir_path,
+        num_realizations,
+        num_phases,
+        grid_size,
+        size,
+        materials,
+        interfaces,
+        components,
+        outputs,
+        solution_parameters,
+        random_seed=None,
+        is_periodic=False,
+        num_processes=1,
+        file_format="yaml",
+        file_name="cipher_input_{idx}",
+    ):
+        """Generate and write an ensemble of random Voronoi inputs, which differ only in
+        their random seed.
+
+        Parameters
+        ----------
+        dir_path : str or Path
+            Directory in which to write the input files and the manifest
+            ("manifest.json"). Created if it does not exist.
+        num_realizations : int
+        random_seed : int, optional
+            Seed from which the (independent) random seeds of the realizations are
+            derived, using `numpy.random.SeedSequence.spawn`.
+        num_processes : int, optional
+            If greater than one, realizations are generated on a process pool of this
+            size. Each realization is written by the worker that generates it.
+        file_format : str, optional
+            Either "yaml" (by default), to write CIPHER input YAML files, or "json", to
+            write the full input (including the geometry) as JSON.
+        file_name : str, optional
+            Format string for the file name (without extension) of each realization,
+            given the realization index `idx`.
+
+        Returns
+        -------
+        manifest : list of dict
+            For each realization: its index, random seed (with which it can be
+            regenerated by `from_random_voronoi`), file path and fingerprint.
+
+        """
+        if file_format not in ("yaml", "json"):
+            raise ValueError(
+                f"`file_format` must be either 'yaml' or 'json', not {file_format!r}."
+            )
+
+        dir_path = Path(dir_path)
+        dir_path.mkdir(parents=True, exist_ok=True)
+
+        seed_seq = np.random.SeedSequence(random_seed)
+        random_seeds = [
+            int(i.generate_state(1)[0]) for i in seed_seq.spawn(num_realizations)
+        ]
+        paths = [
+            dir_path / f"{file_name.format(idx=idx)}.{file_format}"
+            for idx in range(num_realizations)
+        ]
+        kwargs = {
+            "num_phases": num_phases,
+            "grid_size": grid_size,
+            "size": size,
+            "materials": materials,
+            "interfaces": interfaces,
+            "components": components,
+            "outputs": outputs,
+            "solution_parameters": solution_parameters,
+            "is_periodic": is_periodic,
+        }
+        args = [
+            (path, file_format, seed, kwargs) for path, seed in zip(paths, random_seeds)
+        ]
+
+        if num_processes > 1:
+            with ProcessPoolExecutor(max_workers=num_processes) as executor:
+                fingerprints = list(
+                    executor.map(_write_random_voronoi_realization, *zip(*args))
+                )
+        else:
+            fingerprints = [_write_random_voronoi_realization(*i) for i in args]
+
+        manifest = [
+            {
+                "index": idx,
+                "random_seed": seed,
+                "path": str(path),
+                "fingerprint": fingerprint,
+            }
+            for idx, (path, seed, fingerprint) in enumerate(
+                zip(paths, random_seeds, fingerprints)
+            )
+        ]
+        with (dir_path / "manifest.json").open("wt") as fp:
+            json.dump(
+                {"random_seed": seed_seq.entropy, "realizations": manifest},
+                fp,
+                indent=2,
+            )
+
+        return manifest
+
     @classmethod
     def from_voxel_phase_map(
         cls,
@@ -531,17 +684,18 @@ class CIPHERInput:
             "interface": {k: copy.deepcopy(v) for k, v in self.get_interfaces().items()},
             "mappings": {
                 "phase_material_mapping": LiteralScalarString(
-                    compress_1D_array_string(self.geometry.phase_material + 1) + "\n"
+                    compress_1D_array_string(self.geometry.phase_material.astype(int) + 1)
+                    + "\n"
                 ),
                 "voxel_phase_mapping": LiteralScalarString(
                     compress_1D_array_string(
-                        self.geometry.voxel_phase.flatten(order="F") + 1
+                        self.geometry.voxel_phase.flatten(order="F").astype(int) + 1
                     )
                     + "\n"
                 ),
                 "interface_mapping": LiteralScalarString(
                     compress_1D_array_string(
-                        self.geometry.interface_map_int.flatten() + 1
+                        self.geometry.interface_map_int.flatten().astype(int) + 1
                     )
                     + "\n"
                 ),
@@ -12,10 +12,11 @@ import pandas as pd
 import plotly.express as px
 
 from cipher_parse.cipher_input import CIPHERInput
-from cipher_parse.geometry import CIPHERGeometry
+from cipher_parse.geometry import CIPHERGeometry, CIPHERGeometrySnapshot
 from cipher_parse.utilities import (
     get_subset_indices,
     get_time_linear_subset_indices,
+    to_smallest_int_dtype,
     update_plotly_figure_animation_slider_to_times,
 )
 from cipher_parse.derived_outputs import num_voxels_per_phase
@@ -35,10 +36,10 @@ DERIVED_OUTPUTS_REQUIREMENTS = {
 DERIVED_OUTPUTS_FUNCS = {
     "num_voxels_per_phase": num_voxels_per_phase,
 }
-STANDARD_OUTPUTS_TYPES = {
-    "phaseid": int,
-    "interfaceid": int,
-    "matid": int,
+STANDARD_OUTPUTS_CASTS = {
+    "phaseid": to_smallest_int_dtype,
+    "interfaceid": to_smallest_int_dtype,
+    "matid": to_smallest_int_dtype,
 }
 
 
@@ -340,8 +341,8 @@ class CIPHEROutput:
             for name in output_lookup:
                 arr_flat = mesh.get_array(output_lookup[name])
                 arr = arr_flat.reshape(mesh.dimensions, order="F")
-                if name in STANDARD_OUTPUTS_TYPES:
-                    arr = arr.astype(STANDARD_OUTPUTS_TYPES[name])
+                if name in STANDARD_OUTPUTS_CASTS:
+                    arr = STANDARD_OUTPUTS_CASTS[name](arr)
                 standard_outputs[name] = arr
 
             derived_outputs = {}
@@ -440,6 +441,8 @@ class CIPHEROutput:
             for key, val in inc_i.items():
                 if key not in INC_DATA_NON_ARRAYS and not isinstance(val, np.ndarray):
                     as_arr_val = np.array(attrs["incremental_data"][inc_idx][key])
+                    if key in STANDARD_OUTPUTS_CASTS:
+                        as_arr_val = STANDARD_OUTPUTS_CASTS[key](as_arr_val)
                     attrs["incremental_data"][inc_idx][key] = as_arr_val
 
         obj = cls(**attrs, cipher_input=cipher_input, quiet=quiet)
@@ -912,13 +915,9 @@ class CIPHEROutput:
         if start_geom.dimension == 2:
             voxel_phase = voxel_phase[:, :, 0]
 
-        geom = CIPHERGeometry(
-            materials=start_geom.materials,
-            interfaces=start_geom.interfaces,
-            size=start_geom.size,
+        geom = CIPHERGeometrySnapshot(
+            parent=start_geom,
             voxel_phase=voxel_phase,
-            allow_missing_phases=True,
-            quiet=True,
             time=inc_dat["time"],
             increment=inc_dat["increment"],
             incremental_data_idx=inc_data_index,
@@ -5,8 +5,13 @@ from vecmaths.geometry import get_box_xyz
 
 from scipy.spatial import KDTree
 
+from cipher_parse.utilities import get_smallest_int_dtype
 from cipher_parse.voxel_map import VoxelMap
 
+# approximate number of voxels whose coordinates are generated at once during
+# tessellation:
+TESSELLATION_CHUNK_VOXELS = 2**20
+
 
 def get_coordinate_grid(size, grid_size):
     """Get the coordinates of the element centres of a uniform grid."""
@@ -25,6 +30,30 @@ def get_coordinate_grid(size, grid_size):
     return coords, element_size
 
 
+def get_coordinate_grid_slab(size, grid_size, start, stop):
+    """Get the coordinates of the element centres of a slab of a uniform grid, where the
+    slab spans indices `start` to `stop` along the first axis of the array returned by
+    `get_coordinate_grid` (which is the second dimension of `grid_size`).
+
+    The coordinates are identical to the corresponding slab of `get_coordinate_grid`.
+
+    """
+    grid_size = np.array(grid_size)
+    size = np.array(size)
+
+    ranges = [np.arange(i) for i in grid_size]
+    ranges[1] = ranges[1][start:stop]
+    grid = np.meshgrid(*ranges)
+    grid = np.moveaxis(np.array(grid), 0, -1)
+
+    element_size = (size / grid_size).reshape(1, 1, -1)
+
+    coords = grid * size.reshape(1, 1, -1) / grid_size.reshape(1, 1, -1)
+    coords += element_size / 2
+
+    return coords
+
+
 class DiscreteVoronoi(VoxelMap):
     def __init__(
         self,
@@ -34,6 +63,10 @@ class DiscreteVoronoi(VoxelMap):
         is_periodic=True,
         random_seed=None,
         region_data=None,
+        precompute=False,
+        chunk_size=None,
+        workers=-1,
+        hierarchical=False,
     ):
         """
         Parameters
@@ -46,6 +79,21 @@ class DiscreteVoronoi(VoxelMap):
             If not specified, a unit square/box is used.
         is_periodic : bool, optional
             Should the seeds and box be considered periodic. By default, True.
+        precompute : bool, optional
+            If True, find the neighbour voxels and neighbour list on initialisation.
+            Otherwise (by default), these are found on first access.
+        chunk_size : int, optional
+            Number of slices of the voxel grid (along the first array axis) whose
+            coordinates are generated and assigned at once during tessellation. By
+            default, slabs of approximately `TESSELLATION_CHUNK_VOXELS` voxels are used.
+        workers : int, optional
+            Number of workers used by `KDTree.query`. By default, all available CPUs are
+            used.
+        hierarchical : bool, optional
+            If True, use a coarse-to-fine tessellation, where only voxels in blocks whose
+            corners are assigned to different seeds are queried. This is much faster for
+            large grids with few seeds. Labels are identical to the default tessellation,
+            except possibly for voxel centres that are equidistant from two seeds.
 
         """
 
@@ -76,16 +124,20 @@ class DiscreteVoronoi(VoxelMap):
             )
 
         self.seeds = region_seeds
+        self._region_sq_radii = None  # assigned when seeds are first edited
         self.seeds_grid = (grid_size * region_seeds / size).astype(int)
         self.random_seed = random_seed
 
-        region_ID = self._get_region_ID(size, grid_size, is_periodic, dimension)
+        region_ID = self._tessellate(
+            size, grid_size, is_periodic, dimension, chunk_size, workers, hierarchical
+        )
 
         super().__init__(
             region_ID=region_ID,
             size=size,
             is_periodic=is_periodic,
             region_data=region_data,
+            precompute=precompute,
         )
 
     @classmethod
@@ -130,31 +182,30 @@ class DiscreteVoronoi(VoxelMap):
 
     @classmethod
     def get_unique_random_seeds(cls, num_regions, size, grid_size, random_seed=None):
-        """Get random seeds that occupy unique elements on the voxel grid."""
-        max_search_iter = 10_000
-        idx = 0
-        while idx == 0 or np.any(counts > 1):
-            random_seed = random_seed + idx if random_seed else None
-            seeds = cls.get_random_seeds(num_regions, size, random_seed)
-            seeds_grid = (grid_size * seeds / size).astype(int)
-            _, counts = np.unique(seeds_grid, return_counts=True, axis=0)
-            if idx > max_search_iter:
-                raise RuntimeError(
-                    f"Could not find unique random seeds positions (when placed on the "
-                    f"grid) in {max_search_iter} iterations. Consider reducing the "
-                    f"number of regions (currently {num_regions}), or increasing the "
-                    f"`grid_size` (currently {grid_size})."
-                )
-            elif idx % 1000 == 0 and idx > 0:
-                num_multi_counts = np.sum(counts > 1)
-                print(
-                    f"Searching for random unique seeds (attempt "
-                    f"{idx}/{max_search_iter} had {num_multi_counts} repeated seeds)..."
-                )
-            idx += 1
+        """Get random seeds that occupy unique elements on the voxel grid.
 
-        if idx > 10:
-            print(f"Found random unique seeds in {idx} attempts.")
+        Distinct grid elements are sampled without replacement, and each seed is then
+        placed at a random position within its element.
+
+        """
+        size = np.asarray(size)
+        grid_size = np.asarray(grid_size)
+        num_elements = int(np.prod(grid_size))
+        if num_regions > num_elements:
+            raise ValueError(
+                f"Cannot place {num_regions} seeds in unique elements of a grid with "
+                f"only {num_elements} elements (`grid_size` is {grid_size})."
+            )
+
+        rng = np.random.default_rng(seed=random_seed)
+        elem_idx = rng.choice(num_elements, size=num_regions, replace=False)
+        elem_idx = np.array(np.unravel_index(elem_idx, grid_size)).T
+        elem_size = size / grid_size
+        seeds = (elem_idx + rng.random((num_regions, size.size))) * elem_size
+
+        # guard against floating-point round-up into the next element:
+        is_outside = np.any((grid_size * seeds / size).astype(int) != elem_idx, axis=1)
+        seeds[is_outside] = (elem_idx[is_outside] + 0.5) * elem_size
 
         return seeds
 
@@ -165,9 +216,38 @@ class DiscreteVoronoi(VoxelMap):
         seeds = rng.random((num_regions, size.size)) * size
         return seeds
 
-    def _get_region_ID(self, size, grid_size, is_periodic, dimension):
+    def _get_tree(self, size, is_periodic):
+        return self._get_seed_tree(self.seeds, boxsize=size if is_periodic else None)
+
+    def _get_seed_tree(self, seeds, boxsize=None, seed_idx=None):
+        """Get a KDTree of seed positions, which may be periodic images of the seeds,
+        where `seed_idx` are the indices of the seeds (by default, all seeds)."""
+        return KDTree(seeds, boxsize=boxsize)
+
+    def _query_seed_tree(self, tree, coords, workers=-1):
+        """Get the index of the closest seed (within the tree) to each coordinate."""
+        return tree.query(coords, workers=workers)[1]
+
+    def _tessellate(
+        self, size, grid_size, is_periodic, dimension, chunk_size, workers, hierarchical
+    ):
+        if hierarchical:
+            return self._get_region_ID_hierarchical(
+                size, grid_size, is_periodic, dimension, workers
+            )
+        else:
+            return self._get_region_ID(
+                size, grid_size, is_periodic, dimension, chunk_size, workers
+            )
+
+    def _get_region_ID(
+        self, size, grid_size, is_periodic, dimension, chunk_size=None, workers=-1
+    ):
         """Assign voxels to their closest seed point.
 
+        Voxel-centre coordinates are generated and queried one slab at a time, so peak
+        memory does not scale with the full coordinate grid.
+
         Returns
         -------
         region_ID
@@ -176,16 +256,461 @@ class DiscreteVoronoi(VoxelMap):
         """
         print("Tessellating regions...", end="")
 
-        # Get coordinates of grid element centres:
-        coords, _ = get_coordinate_grid(size, grid_size)
-        coords_flat = coords.reshape(-1, dimension)
-        tree = KDTree(self.seeds, boxsize=size if is_periodic else None)
-        region_ID = tree.query(coords_flat)[1].reshape(coords.shape[:-1])
+        tree = self._get_tree(size, is_periodic)
+
+        # `get_coordinate_grid` uses "xy" indexing, so the first two axes are swapped:
+        shape = tuple(grid_size[[1, 0, *range(2, dimension)]])
+        region_ID = np.empty(
+            shape, dtype=get_smallest_int_dtype(max(self.seeds.shape[0] - 1, 0))
+        )
+        if chunk_size is None:
+            slice_size = max(np.prod(shape[1:]), 1)
+            chunk_size = max(TESSELLATION_CHUNK_VOXELS // slice_size, 1)
+
+        for start in range(0, shape[0], chunk_size):
+            stop = min(start + chunk_size, shape[0])
+            coords = get_coordinate_grid_slab(size, grid_size, start, stop)
+            idx = self._query_seed_tree(tree, coords.reshape(-1, dimension), workers)
+            region_ID[start:stop] = idx.reshape(coords.shape[:-1])
+
+        print("done!")
+
+        return region_ID
+
+    def _get_region_ID_hierarchical(
+        self, size, grid_size, is_periodic, dimension, workers=-1
+    ):
+        """Assign voxels to their closest seed point, using a coarse-to-fine approach.
+
+        Voronoi cells are convex, so if all corner voxels of a block are closest to the
+        same seed, so are all voxels within the block. Starting from the whole grid,
+        blocks whose corners disagree are recursively split in two along each axis,
+        down to single-voxel spacing.
+
+        For periodic tessellations, the nearest seed is found among the periodic images
+        of the seeds, since the cells of the individual images (rather than their
+        periodic union) are convex.
+
+        """
+        print("Tessellating regions (hierarchical)...", end="")
+
+        size = np.asarray(size)
+        grid_size = np.asarray(grid_size)
+        num_seeds = self.seeds.shape[0]
+        if is_periodic:
+            image_shifts = np.array(np.meshgrid(*[[-1, 0, 1]] * dimension)).reshape(
+                dimension, -1
+            )
+            seeds = (self.seeds[None] + (image_shifts.T * size)[:, None]).reshape(
+                -1, dimension
+            )
+        else:
+            seeds = self.seeds
+        tree = self._get_seed_tree(
+            seeds, seed_idx=np.tile(np.arange(num_seeds), seeds.shape[0] // num_seeds)
+        )
+
+        # `get_coordinate_grid` uses "xy" indexing, so the first two axes are swapped:
+        axes_order = [1, 0, *range(2, dimension)]
+        shape = tuple(grid_size[axes_order])
+        array_size = size[axes_order]
+        array_grid_size = grid_size[axes_order]
+        element_size = array_size / array_grid_size
+
+        def query(idx):
+            # coordinates computed as in `get_coordinate_grid`:
+            coords = idx * array_size / array_grid_size
+            coords += element_size / 2
+            return self._query_seed_tree(tree, coords[:, axes_order], workers)
+
+        # index of the closest (image) seed; -1 if not yet assigned:
+        labels = np.full(shape, -1, dtype=get_smallest_int_dtype(seeds.shape[0], -1))
+
+        # blocks at a given level have side length `block_size` (or less at the upper
+        # grid edges); corners of blocks are shared with their neighbours:
+        block_size = 2 ** int(np.floor(np.log2(max(max(shape) - 1, 1))))
+        is_active = None  # mask of blocks to be resolved
+        while True:
+            num_blocks = [max(int(np.ceil((n - 1) / block_size)), 1) for n in shape]
+            if is_active is None:
+                is_active = np.ones(num_blocks, dtype=bool)
+            corner_pos = [
+                np.minimum(np.arange(nb + 1) * block_size, n - 1)
+                for nb, n in zip(num_blocks, shape)
+            ]
+
+            # label the corners of active blocks that are not yet labelled:
+            corner_slices = self._get_block_corner_slices(dimension)
+            is_needed = np.zeros([nb + 1 for nb in num_blocks], dtype=bool)
+            for corner_slice in corner_slices:
+                is_needed[corner_slice] |= is_active
+            needed_idx = np.nonzero(is_needed)
+            needed_vox = tuple(pos[i] for pos, i in zip(corner_pos, needed_idx))
+            is_unlabelled = labels[needed_vox] == -1
+            unlabelled_vox = np.array([i[is_unlabelled] for i in needed_vox])
+            if unlabelled_vox.size:
+                labels[tuple(unlabelled_vox)] = query(unlabelled_vox.T)
+
+            if block_size == 1:
+                # all voxels of unresolved blocks are corners, so are now labelled
+                break
+
+            # fill blocks whose corners all agree:
+            corner_labels = labels[np.ix_(*corner_pos)]
+            block_label = corner_labels[corner_slices[0]]
+            is_agreed = np.copy(is_active)
+            for corner_slice in corner_slices[1:]:
+                is_agreed &= corner_labels[corner_slice] == block_label
+            block_label = np.where(is_agreed, block_label, -1)
+            vox_block = [
+                np.minimum(np.arange(n) // block_size, nb - 1)
+                for nb, n in zip(num_blocks, shape)
+            ]
+            vox_label = block_label[np.ix_(*vox_block)]
+            labels = np.where(vox_label != -1, vox_label, labels)
+
+            # split unresolved blocks in two along each axis:
+            block_size //= 2
+            num_blocks_sub = [max(int(np.ceil((n - 1) / block_size)), 1) for n in shape]
+            is_active = (is_active & ~is_agreed)[
+                np.ix_(
+                    *[
+                        np.minimum(np.arange(nb_sub) // 2, nb - 1)
+                        for nb_sub, nb in zip(num_blocks_sub, num_blocks)
+                    ]
+                )
+            ]
+            if not np.any(is_active):
+                break
+
+        region_ID = (labels % num_seeds).astype(
+            get_smallest_int_dtype(max(num_seeds - 1, 0))
+        )
 
         print("done!")
 
         return region_ID
 
+    @staticmethod
+    def _get_block_corner_slices(dimension):
+        """Get the slices into an array of block corners that give, for each corner
+        offset, the corner of each block."""
+        return [
+            tuple(slice(1, None) if i else slice(None, -1) for i in offset)
+            for offset in np.ndindex(*(2,) * dimension)
+        ]
+
+    @property
+    def _axes_order(self):
+        # `get_coordinate_grid` uses "xy" indexing, so the first two axes are swapped:
+        return [1, 0, *range(2, self.dimension)]
+
+    def _get_voxel_coordinates(self, idx):
+        """Get the coordinates of voxel centres, computed as in `get_coordinate_grid`.
+
+        Parameters
+        ----------
+        idx : ndarray of shape (N, dimension)
+            Array indices into `region_ID`.
+
+        """
+        axes_order = self._axes_order
+        array_size = self.size[axes_order]
+        array_grid_size = self.grid_size
+        coords = idx * array_size / array_grid_size
+        coords += (array_size / array_grid_size) / 2
+        return coords[:, axes_order]
+
+    def _get_squared_distances(self, coords, seeds):
+        """Get the squared (minimum-image, if periodic) distances between rows of
+        `coords` and `seeds`."""
+        delta = np.abs(coords - seeds)
+        if self.is_periodic:
+            delta = np.minimum(delta, self.size - delta)
+        return np.sum(delta**2, axis=1)
+
+    def _get_face_neighbours(self, idx, axis, direction):
+        """Get the array indices of the face neighbours of voxels `idx` in a given
+        direction, and a mask of the voxels that have such a neighbour."""
+        idx_nb = np.copy(idx)
+        idx_nb[:, axis] += direction
+        if self.is_periodic:
+            idx_nb[:, axis] %= self.shape[axis]
+            is_valid = np.ones(idx.shape[0], dtype=bool)
+        else:
+            is_valid = (idx_nb[:, axis] >= 0) & (idx_nb[:, axis] < self.shape[axis])
+        return idx_nb, is_valid
+
+    def _get_voxel_faces(self, idx):
+        """Get the voxel faces of a set of voxels, with the region IDs either side of
+        each face, in the format yielded by `iter_boundary_faces`. Faces shared between
+        two voxels of the set are included once."""
+        idx_flat = np.ravel_multi_index(tuple(idx.T), self.shape)
+        faces = []
+        for axis in range(self.dimension):
+            for direction in (1, -1):
+                idx_nb, is_valid = self._get_face_neighbours(idx, axis, direction)
+                idx_i, idx_nb = idx[is_valid], idx_nb[is_valid]
+                if direction == -1:
+                    # faces within the set are found in the positive direction only:
+                    nb_flat = np.ravel_multi_index(tuple(idx_nb.T), self.shape)
+                    is_outside = ~np.isin(nb_flat, idx_flat)
+                    idx_i, idx_nb = idx_i[is_outside], idx_nb[is_outside]
+                faces.append(
+                    (
+                        axis,
+                        self.region_ID[tuple(idx_i.T)],
+                        self.region_ID[tuple(idx_nb.T)],
+                    )
+                )
+        return faces
+
+    def _relabel_voxels(self, idx, labels):
+        """Assign new region IDs to a set of voxels, updating the adjacency graph, region
+        voxel counts and region radii (if already computed) from the relabelled voxels
+        only.
+
+        Parameters
+        ----------
+        idx : ndarray of shape (N, dimension)
+            Unique array indices into `region_ID`.
+        labels : ndarray of shape (N,)
+            New region IDs of the voxels.
+
+        """
+        old_labels = self.region_ID[tuple(idx.T)]
+        is_changed = old_labels != labels
+        idx, labels, old_labels = (
+            idx[is_changed],
+            labels[is_changed],
+            old_labels[is_changed],
+        )
+        if not idx.size:
+            return
+
+        num_regions = self.num_seeds
+        dtype = get_smallest_int_dtype(max(num_regions - 1, 0))
+        if np.iinfo(dtype).max > np.iinfo(self.region_ID.dtype).max:
+            self.region_ID = self.region_ID.astype(dtype)
+
+        has_neighbour_list = self._neighbour_list is not None
+        graph = self._adjacency_graph
+        if graph is None and has_neighbour_list:
+            graph = self.adjacency_graph
+        num_voxels = self._region_num_voxels
+
+        if graph is not None:
+            removed_faces = self._get_voxel_faces(idx)
+
+        self.region_ID[tuple(idx.T)] = labels
+        self.region_ID_version += 1
+
+        if graph is not None:
+            added_faces = self._get_voxel_faces(idx)
+            graph = graph.get_updated(
+                removed_faces, added_faces, self.spacing, num_regions=num_regions
+            )
+        if num_voxels is not None:
+            num_voxels = self._pad_region_array(num_voxels)
+            np.subtract.at(num_voxels, old_labels, 1)
+            np.add.at(num_voxels, labels, 1)
+        if self._region_sq_radii is not None:
+            # radii of regions that lose voxels are kept as upper bounds:
+            self._region_sq_radii = self._pad_region_array(self._region_sq_radii)
+            sq_dist = self._get_squared_distances(
+                self._get_voxel_coordinates(idx), self.seeds[labels]
+            )
+            np.maximum.at(self._region_sq_radii, labels, sq_dist)
+
+        self.clear_neighbour_region_cache()
+        self._adjacency_graph = graph
+        self._region_num_voxels = num_voxels
+        if num_voxels is not None:
+            self._num_regions = int(np.count_nonzero(num_voxels))
+        if has_neighbour_list:
+            self._neighbour_list = graph.get_edges()
+
+    def _pad_region_array(self, arr):
+        """Pad a per-region array with zeros up to the number of seeds."""
+        return np.concatenate(
+            [arr, np.zeros(max(self.num_seeds - arr.size, 0), dtype=arr.dtype)]
+        )
+
+    def get_region_sq_radii(self):
+        """Get the maximum squared distance between each seed and the voxels of its
+        region."""
+        sq_radii = np.zeros(self.num_seeds)
+        slice_size = max(np.prod(self.shape[1:]), 1)
+        chunk_size = max(TESSELLATION_CHUNK_VOXELS // slice_size, 1)
+        for start in range(0, self.shape[0], chunk_size):
+            stop = min(start + chunk_size, self.shape[0])
+            idx = np.indices((stop - start, *self.shape[1:])).reshape(self.dimension, -1)
+            idx[0] += start
+            labels = self.region_ID[start:stop].reshape(-1)
+            sq_dist = self._get_squared_distances(
+                self._get_voxel_coordinates(idx.T), self.seeds[labels]
+            )
+            np.maximum.at(sq_radii, labels, sq_dist)
+        return sq_radii
+
+    def _claim_voxels(self, seed_idx):
+        """Assign to a seed all voxels that are closer to it than to their current seed.
+
+        A voxel at `x` in the region of seed `j` (with radius `R_j`) can only be closer
+        to seed `p` if `|p - s_j| <= |p - x| + |x - s_j| < 2 R_j`, so only the regions of
+        seeds that satisfy this bound are checked.
+
+        """
+        if self._region_sq_radii is None:
+            self._region_sq_radii = self.get_region_sq_radii()
+
+        seed = self.seeds[seed_idx]
+        sq_radii = self._pad_region_array(self._region_sq_radii)
+        is_candidate = self._get_squared_distances(self.seeds, seed) <= 4 * sq_radii
+        is_candidate[seed_idx] = False
+
+        idx = np.array(np.nonzero(is_candidate[self.region_ID])).T
+        if not idx.size:
+            return
+        current = self.region_ID[tuple(idx.T)]
+        coords = self._get_voxel_coordinates(idx)
+        is_closer = self._get_squared_distances(
+            coords, seed
+        ) < self._get_squared_distances(coords, self.seeds[current])
+        idx = idx[is_closer]
+        self._relabel_voxels(idx, np.full(idx.shape[0], seed_idx))
+
+    def _check_seed_position(self, position):
+        position = np.asarray(position)
+        if position.shape != (self.dimension,):
+            raise ValueError(
+                f"Seed position must be of length {self.dimension}, but has shape: "
+                f"{position.shape}."
+            )
+        if np.any(position < 0) or np.any(position > self.size):
+            raise ValueError(f"Seed position must be within `size` ({self.size}).")
+        return position
+
+    def _check_editable(self):
+        if self.region_data:
+            raise ValueError(
+                f"Seeds cannot be edited when `region_data` is assigned (keys: "
+                f"{list(self.region_data)!r}), because per-region data is not updated "
+                f"when regions are added, moved or removed."
+            )
+
+    def _set_seeds(self, seeds):
+        self.seeds = seeds
+        grid_size = self.grid_size[self._axes_order]
+        self.seeds_grid = (grid_size * seeds / self.size).astype(int)
+
+    def _reassign_region(self, seed_idx, seed_map=None):
+        """Reassign the voxels of a region to their closest seed in the current seed set.
+        `seed_map` maps the indices of the current seed set to the region IDs to assign.
+
+        Returns
+        -------
+        sq_radius : float
+            The maximum squared distance between seed `seed_idx` and the voxels that are
+            still assigned to it.
+
+        """
+        idx = np.array(np.nonzero(self.region_ID == seed_idx)).T
+        if not idx.size:
+            return 0.0
+        seeds = self.seeds if seed_map is None else self.seeds[seed_map]
+        tree = KDTree(seeds, boxsize=self.size if self.is_periodic else None)
+        sq_dist, labels = tree.query(self._get_voxel_coordinates(idx))
+        if seed_map is not None:
+            labels = seed_map[labels]
+        self._relabel_voxels(idx, labels)
+        sq_dist = sq_dist[labels == seed_idx] ** 2
+        return sq_dist.max() if sq_dist.size else 0.0
+
+    def add_seed(self, position):
+        """Add a new seed, and update the tessellation around it.
+
+        Parameters
+        ----------
+        position : list or ndarray of length 2 or 3
+            Coordinates of the new seed within `size`.
+
+        Returns
+        -------
+        seed_idx : int
+            Index (and region ID) of the new seed.
+
+        """
+        self._check_editable()
+        position = self._check_seed_position(position)
+        seed_idx = self.num_seeds
+        self._set_seeds(np.vstack([self.seeds, position]))
+        self._claim_voxels(seed_idx)
+        return seed_idx
+
+    def move_seed(self, seed_idx, position):
+        """Move an existing seed, and update the tessellation around its old and new
+        positions.
+
+        Parameters
+        ----------
+        seed_idx : int
+            Index of the seed to move.
+        position : list or ndarray of length 2 or 3
+            New coordinates of the seed within `size`.
+
+        """
+        self._check_editable()
+        position = self._check_seed_position(position)
+        seeds = np.copy(self.seeds)
+        seeds[seed_idx] = position
+        self._set_seeds(seeds)
+        sq_radius = self._reassign_region(seed_idx)
+        if self._region_sq_radii is not None:
+            self._region_sq_radii[seed_idx] = sq_radius
+        self._claim_voxels(seed_idx)
+
+    def remove_seed(self, seed_idx):
+        """Remove a seed, and reassign its voxels to the remaining seeds. Seeds (and
+        region IDs) with a larger index are shifted down by one.
+
+        Parameters
+        ----------
+        seed_idx : int
+            Index of the seed to remove.
+
+        """
+        self._check_editable()
+        if self.num_seeds == 1:
+            raise ValueError("Cannot remove the only seed.")
+        seed_map = np.delete(np.arange(self.num_seeds), seed_idx)
+        self._reassign_region(seed_idx, seed_map=seed_map)
+
+        # renumber regions:
+        region_map = np.arange(self.num_seeds)
+        region_map -= region_map > seed_idx
+        self.region_ID -= (self.region_ID > seed_idx).astype(self.region_ID.dtype)
+        self.region_ID_version += 1
+        graph = self._adjacency_graph
+        num_voxels = self._region_num_voxels
+        has_neighbour_list = self._neighbour_list is not None
+        if self._region_sq_radii is not None:
+            self._region_sq_radii = np.delete(
+                self._pad_region_array(self._region_sq_radii), seed_idx
+            )
+        if num_voxels is not None:
+            num_voxels = np.delete(self._pad_region_array(num_voxels), seed_idx)
+        self._set_seeds(np.delete(self.seeds, seed_idx, axis=0))
+
+        self.clear_neighbour_region_cache()
+        if graph is not None:
+            self._adjacency_graph = graph.get_renumbered(region_map, self.num_seeds)
+            if has_neighbour_list:
+                self._neighbour_list = self._adjacency_graph.get_edges()
+        if num_voxels is not None:
+            self._region_num_voxels = num_voxels
+            self._num_regions = int(np.count_nonzero(num_voxels))
+
     @property
     def num_seeds(self):
         return self.seeds_grid.shape[0]
@@ -352,3 +877,199 @@ class DiscreteVoronoi(VoxelMap):
         )
 
         return fig
+
+
+class PowerVoronoi(DiscreteVoronoi):
+    """A discrete power (Laguerre) tessellation, in which voxels are assigned to the seed
+    that minimises the power distance `|x - s_i|^2 - r_i^2`, where `r_i` is the radius of
+    seed `i`. Larger radii produce larger regions.
+
+    The closest seed is found with a KDTree, by lifting the seeds into an additional
+    dimension with coordinate `sqrt(r_max^2 - r_i^2)` (and the voxels into the same
+    dimension with coordinate zero), so that squared Euclidean distances in the lifted
+    space differ from power distances by a constant.
+
+    Seeds whose regions contain no voxels are removed, and the remaining regions
+    renumbered, so region IDs are consecutive.
+
+    """
+
+    def __init__(
+        self,
+        region_seeds,
+        region_radii,
+        grid_size,
+        size=None,
+        is_periodic=True,
+        random_seed=None,
+        region_data=None,
+        precompute=False,
+        chunk_size=None,
+        workers=-1,
+        hierarchical=False,
+    ):
+        """
+        Parameters
+        ----------
+        region_seeds : list or ndarray of shape (N, 2) or (N, 3)
+            Row vectors of seed positions in 2D or 3D. Must be coordinates within real-space
+            `size`.
+        region_radii : list or ndarray of shape (N,)
+            Non-negative radius of each seed. If all radii are equal, the tessellation is
+            identical to the Voronoi tessellation.
+
+        """
+        region_radii = np.asarray(region_radii, dtype=float)
+        if region_radii.shape != (np.asarray(region_seeds).shape[0],):
+            raise ValueError(
+                f"`region_radii` must be a 1D array with one radius per seed, but has "
+                f"shape: {region_radii.shape}."
+            )
+        if np.any(region_radii < 0):
+            raise ValueError("`region_radii` must be non-negative.")
+
+        self.radii = region_radii
+        super().__init__(
+            region_seeds=region_seeds,
+            grid_size=grid_size,
+            size=size,
+            is_periodic=is_periodic,
+            random_seed=random_seed,
+            region_data=region_data,
+            precompute=precompute,
+            chunk_size=chunk_size,
+            workers=workers,
+            hierarchical=hierarchical,
+        )
+
+    @classmethod
+    def from_random(
+        cls,
+        size,
+        grid_size,
+        num_regions,
+        region_radii=None,
+        size_distribution=None,
+        random_seed=None,
+        is_periodic=True,
+    ):
+        """Generate a power tessellation from randomly positioned seeds.
+
+        Parameters
+        ----------
+        region_radii : list or ndarray of shape (num_regions,), optional
+            Radius of each seed. Specify exactly one of `region_radii` and
+            `size_distribution`.
+        size_distribution : dict, optional
+            Distribution from which seed radii are sampled; see `get_random_radii`.
+
+        """
+        if sum(i is not None for i in (region_radii, size_distribution)) != 1:
+            raise ValueError(
+                "Specify exactly one of `region_radii` and `size_distribution`."
+            )
+
+        seed_seqs = np.random.SeedSequence(random_seed).spawn(2)
+        region_seeds = cls.get_unique_random_seeds(
+            num_regions=num_regions,
+            size=size,
+            grid_size=grid_size,
+            random_seed=seed_seqs[0],
+        )
+        if region_radii is None:
+            region_radii = cls.get_random_radii(
+                num_regions, size_distribution, random_seed=seed_seqs[1]
+            )
+
+        return cls(
+            size=size,
+            grid_size=grid_size,
+            region_seeds=region_seeds,
+            region_radii=region_radii,
+            random_seed=random_seed,
+            is_periodic=is_periodic,
+        )
+
+    @staticmethod
+    def get_random_radii(num_regions, size_distribution, random_seed=None):
+        """Sample seed radii from a size distribution.
+
+        Parameters
+        ----------
+        num_regions : int
+        size_distribution : dict
+            Distribution of the seed radii, where "type" is one of:
+                "lognormal" (default)
+                    Specified either by the mean ("mu") and standard deviation
+                    ("sigma") of the natural logarithm of the radius, or by the target
+                    mean ("mean") and standard deviation ("std") of the radius itself.
+                "empirical"
+                    Radii are drawn (with replacement) from the target radii listed in
+                    "radii", e.g. as measured from an experimental microstructure.
+        random_seed : int or np.random.SeedSequence, optional
+
+        """
+        size_distribution = dict(size_distribution)
+        dist_type = size_distribution.pop("type", "lognormal")
+        rng = np.random.default_rng(seed=random_seed)
+
+        if dist_type == "lognormal":
+            if set(size_distribution) == {"mean", "std"}:
+                mean, std = size_distribution["mean"], size_distribution["std"]
+                sigma = np.sqrt(np.log(1 + (std / mean) ** 2))
+                mu = np.log(mean) - sigma**2 / 2
+            elif set(size_distribution) == {"mu", "sigma"}:
+                mu, sigma = size_distribution["mu"], size_distribution["sigma"]
+            else:
+                raise ValueError(
+                    f"Specify a log-normal size distribution by either 'mu' and 'sigma', "
+                    f"or 'mean' and 'std', but not: {sorted(size_distribution)!r}."
+                )
+            return rng.lognormal(mean=mu, sigma=sigma, size=num_regions)
+
+        elif dist_type == "empirical":
+            radii = np.asarray(size_distribution["radii"], dtype=float)
+            if not radii.size or np.any(radii < 0):
+                raise ValueError(
+                    "Empirical size distribution 'radii' must be a non-empty list of "
+                    "non-negative radii."
+                )
+            return rng.choice(radii, size=num_regions)
+
+        raise ValueError(
+            f"Unsupported size distribution type: {dist_type!r}. Must be one of "
+            f"'lognormal' and 'empirical'."
+        )
+
+    def _get_seed_tree(self, seeds, boxsize=None, seed_idx=None):
+        sq_radii = self.radii**2
+        if seed_idx is not None:
+            sq_radii = sq_radii[seed_idx]
+        lift = np.sqrt(np.max(self.radii) ** 2 - sq_radii)
+        if boxsize is not None:
+            # the lifted dimension must not wrap:
+            boxsize = np.append(boxsize, 2 * np.max(lift, initial=0) + 1)
+        return KDTree(np.column_stack([seeds, lift]), boxsize=boxsize)
+
+    def _query_seed_tree(self, tree, coords, workers=-1):
+        coords = np.column_stack([coords, np.zeros(coords.shape[0])])
+        return tree.query(coords, workers=workers)[1]
+
+    def _tessellate(self, *args, **kwargs):
+        region_ID = super()._tessellate(*args, **kwargs)
+
+        # remove seeds whose regions are empty, and renumber:
+        is_occupied = np.bincount(region_ID.reshape(-1), minlength=self.num_seeds) > 0
+        if not np.all(is_occupied):
+            region_map = np.cumsum(is_occupied) - 1
+            region_ID = region_map[region_ID].astype(
+                get_smallest_int_dtype(max(np.count_nonzero(is_occupied) - 1, 0))
+            )
+            self.seeds = self.seeds[is_occupied]
+            self.seeds_grid = self.seeds_grid[is_occupied]
+            self.radii = self.radii[is_occupied]
+
+        return region_ID
+
+    def _check_editable(self):
+        raise TypeError("Seeds of a power tessellation cannot be edited.")
@@ -1,12 +1,16 @@
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import copy
+from multiprocessing import shared_memory
+
 from damask import Orientation
 import pyvista as pv
 import numpy as np
 import plotly.express as px
 
-from cipher_parse.material import MaterialDefinition
+from cipher_parse.material import MaterialDefinition, PhaseTypeDefinition
 from cipher_parse.interface import InterfaceDefinition
-from cipher_parse.discrete_voronoi import DiscreteVoronoi
-from cipher_parse.voxel_map import VoxelMap
+from cipher_parse.discrete_voronoi import DiscreteVoronoi, PowerVoronoi
+from cipher_parse.voxel_map import VoxelMap, encode_pair_keys
 from cipher_parse.errors import (
     GeometryDuplicateMaterialNameError,
     GeometryExcessTargetVolumeFractionError,
@@ -15,9 +19,77 @@ from cipher_parse.errors import (
     GeometryUnassignedPhasePairInterfaceError,
     GeometryVoxelPhaseError,
 )
-from cipher_parse.utilities import generate_interface_energies_plot
+from cipher_parse.utilities import (
+    ArrayCache,
+    generate_interface_energies_plot,
+    get_block_mode,
+    get_fingerprint,
+    get_smallest_int_dtype,
+    to_smallest_int_dtype,
+)
 from cipher_parse.quats import quat_angle_between
 
+INTERFACE_MAP_CHUNK_SIZE = 10_000_000
+
+# default cache of memoized voxel-level fields (e.g. `voxel_material`), shared by all
+# geometries within a single memory budget, which may be changed by assigning to its
+# `max_bytes` attribute:
+DERIVED_FIELDS_CACHE = ArrayCache(max_bytes=2 * 1024**3)
+
+
+def _get_misorientation_block(shm_name, num_phases, all_oris, row_start, row_stop):
+    """Compute the upper-triangle disorientation angles (in radians) for a block of rows
+    of the misorientation matrix, writing directly into a shared-memory array.
+
+    Returns
+    -------
+    num_pairs : int
+        The number of phase pairs processed.
+
+    """
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        misori_matrix = np.ndarray((num_phases, num_phases), dtype=float, buffer=shm.buf)
+        num_pairs = _fill_misorientation_rows(
+            misori_matrix, all_oris, row_start, row_stop
+        )
+    finally:
+        shm.close()
+    return num_pairs
+
+
+def _fill_misorientation_rows(misori_matrix, all_oris, row_start, row_stop):
+    """Fill the upper triangle of some rows of a misorientation matrix (in radians)."""
+    all_oris = Orientation(all_oris, family="cubic")  # TODO: generalise symmetry
+    num_pairs = 0
+    for idx in range(row_start, row_stop):
+        other_oris = all_oris[idx + 1 :]
+        if other_oris.size:
+            disori_i = all_oris[idx : idx + 1].disorientation(other_oris)
+            misori_matrix[idx, idx + 1 :] = disori_i.as_axis_angle()[..., -1]
+            num_pairs += other_oris.size
+    return num_pairs
+
+
+def _get_misorientation_row_blocks(num_phases, num_blocks):
+    """Split the rows of an upper-triangle matrix into contiguous blocks that contain
+    approximately equal numbers of elements."""
+    row_num_pairs = np.arange(num_phases)[::-1]
+    cumulative = np.cumsum(row_num_pairs)
+    targets = cumulative[-1] * np.arange(1, num_blocks) / num_blocks
+    bounds = np.unique(
+        np.concatenate([[0], np.searchsorted(cumulative, targets) + 1, [num_phases]])
+    )
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def _print_misorientation_progress(num_done, num_total):
+    print(
+        f"Finding misorientations: {num_done}/{num_total} phase pairs "
+        f"({num_done / max(num_total, 1) * 100:.0f}%).",
+        flush=True,
+    )
+
 
 class CIPHERGeometry:
     def __init__(
@@ -35,6 +107,8 @@ class CIPHERGeometry:
         time=None,
         increment=None,
         incremental_data_idx=None,
+        interface_map=None,
+        derived_fields_cache=None,
     ):
         """
         Parameters
@@ -42,6 +116,14 @@ class CIPHERGeometry:
 
         allow_missing_phases : bool, optional
             If True, allow references to phases that do not appear in the voxel map.
+        interface_map : ndarray of shape (num_phases, num_phases), optional
+            Interface index of each phase pair. If not specified (by default), this is
+            generated from the interface definitions. If specified, it must be symmetric,
+            with NaN or -1 on the diagonal and indices into `interfaces` elsewhere, and
+            consistent with the phase pairs of the interface definitions.
+        derived_fields_cache : ArrayCache, optional
+            Cache of memoized voxel-level fields, whose memory budget is shared by all
+            geometries that use it. By default, the module-level `DERIVED_FIELDS_CACHE`.
 
         """
 
@@ -55,13 +137,22 @@ class CIPHERGeometry:
                 quiet=quiet,
             )
         else:
-            voxel_phase = voxel_map.region_ID
             is_periodic = voxel_map.is_periodic
 
+        # share the (compact integer) region ID array of the voxel map:
+        voxel_phase = voxel_map.region_ID
+
         self._interfaces = None
         self._is_periodic = is_periodic
 
+        # memoized voxel-level fields (e.g. `voxel_material`); see `_get_derived_field`:
+        if derived_fields_cache is None:
+            derived_fields_cache = DERIVED_FIELDS_CACHE
+        self.derived_fields_cache = derived_fields_cache
+        self._fingerprint = None  # assigned on first access of `fingerprint`
+
         self.voxel_map = voxel_map
+        self._voxel_map_version = voxel_map.region_ID_version
         self.voxel_phase = voxel_phase
         self.seeds = np.asarray(seeds)
         self.materials = materials
@@ -109,6 +200,15 @@ class CIPHERGeometry:
 
         self._phase_phase_type = self._get_phase_phase_type()
 
+        self._init_lazy_attributes()
+
+        if interface_map is None:
+            interface_map = self._get_interface_map(quiet=quiet, random_seed=random_seed)
+        self.interface_map = interface_map
+
+        self.phase_orientation = self._get_phase_orientation()
+
+    def _init_lazy_attributes(self):
         # assigned by calculate_* methods on first call to corresponding get_* methods:
         self._phase_voxels = None
         self._phase_num_voxels = None
@@ -118,29 +218,54 @@ class CIPHERGeometry:
         self._grain_boundaries = None
         self._grain_boundary_centroids = None
 
-        self._interface_map = self._get_interface_map(quiet=quiet)
-        self._validate_interface_map()  # TODO: add setter to interface map
-
-        self.phase_orientation = self._get_phase_orientation()
-
         # assigned by `get_misorientation_matrix`:
         self._misorientation_matrix = None
         self._misorientation_matrix_is_degrees = None
 
     def __eq__(self, other):
         # Note we don't check seeds (not stored in YAML file)
-        if not isinstance(other, self.__class__):
+        if self is other:
+            return True
+        if not isinstance(other, CIPHERGeometry):
             return False
+        if self.fingerprint == other.fingerprint:
+            return True
         if (
             self.materials == other.materials
             and self.interfaces == other.interfaces
-            and np.all(self.size == self.size)
-            and np.all(self.random_seed == self.random_seed)
-            and np.all(self.voxel_phase == self.voxel_phase)
+            and np.array_equal(self.size, other.size)
+            and np.all(self.random_seed == other.random_seed)
+            and np.array_equal(self.voxel_phase, other.voxel_phase)
         ):
             return True
         return False
 
+    @property
+    def fingerprint(self):
+        """Get a content hash of the geometry, which is computed once and cached.
+
+        The hash covers the voxel phase map, size, random seed, periodicity, material
+        definitions (including phase types and orientations), interface definitions and
+        the interface map, but not the seeds. The cached value is cleared when the voxel
+        phase map, materials, interfaces, interface map or phase orientations are set,
+        and when the voxel map is edited (e.g. by moving its seeds). It is not cleared
+        when material or interface definitions are modified in place; reassign
+        `materials` or `interfaces` after doing so.
+
+        """
+        self._check_memoized_fields()
+        if self._fingerprint is None:
+            self._fingerprint = get_fingerprint(
+                to_smallest_int_dtype(self.voxel_phase),
+                self.size.astype(float),
+                self.random_seed,
+                self.is_periodic,
+                [i.to_JSON(keep_arrays=True) for i in self.materials],
+                [i.to_JSON(keep_arrays=True) for i in self.interfaces],
+                self.interface_map,
+            )
+        return self._fingerprint
+
     def _validate_interfaces(self):
         int_names = self.interface_names
         if len(set(int_names)) < len(int_names):
@@ -179,6 +304,7 @@ class CIPHERGeometry:
                     "voxel_indices": list(i.tolist() for i in GB["voxel_indices"]),
                     "voxel_coordinates": GB["voxel_coordinates"].tolist(),
                     "centroid": GB["centroid"].tolist(),
+                    "area": GB.get("area"),
                 }
 
         return data
@@ -206,6 +332,7 @@ class CIPHERGeometry:
                 "voxel_indices": tuple(np.array(i) for i in GB["voxel_indices"]),
                 "voxel_coordinates": np.array(GB["voxel_coordinates"]),
                 "centroid": np.array(GB["centroid"]),
+                "area": GB.get("area"),
             }
         obj = cls(**data_init, quiet=quiet)
         if data["misorientation_matrix"] is not None:
@@ -228,6 +355,24 @@ class CIPHERGeometry:
             phases.append(mat.phases)
         return np.concatenate(phases)
 
+    @property
+    def voxel_phase(self):
+        return self._voxel_phase
+
+    @voxel_phase.setter
+    def voxel_phase(self, voxel_phase):
+        self._voxel_phase = voxel_phase
+        self._invalidate_derived_fields()
+
+    @property
+    def materials(self):
+        return self._materials
+
+    @materials.setter
+    def materials(self, materials):
+        self._materials = materials
+        self._invalidate_derived_fields()
+
     @property
     def interfaces(self):
         return self._interfaces
@@ -240,6 +385,31 @@ class CIPHERGeometry:
     def interfaces(self, interfaces):
         self._interfaces = interfaces
         self._validate_interfaces()
+        self._invalidate_derived_fields()
+
+    def _get_derived_field(self, name, func):
+        """Get a memoized voxel-level field, computing it with `func` if necessary.
+
+        Fields are keyed by the geometry fingerprint, so that the cache can be shared
+        between geometries.
+
+        """
+        return self.derived_fields_cache.get((self.fingerprint, name), func)
+
+    def _invalidate_derived_fields(self):
+        """Clear the fingerprint, so that memoized voxel-level fields are no longer
+        looked up (they are evicted from the cache as its memory budget requires); this
+        must be called whenever the voxel phase map, materials, interfaces, interface map,
+        or phase orientations change."""
+        self._fingerprint = None
+
+    def _check_memoized_fields(self):
+        """Invalidate memoized fields (and the fingerprint) if the voxel map has been
+        edited in place since they were computed."""
+        version = self.voxel_map.region_ID_version
+        if version != self._voxel_map_version:
+            self._invalidate_derived_fields()
+            self._voxel_map_version = version
 
     @property
     def misorientation_matrix(self):
@@ -297,7 +467,8 @@ class CIPHERGeometry:
 
     def _calculate_phase_voxel_coordinates(self):
         self._phase_voxel_coordinates = [
-            self.voxel_map.coordinates[i] for i in self.get_phase_voxel_indices()
+            self.voxel_map.get_voxel_coordinates(i)
+            for i in self.get_phase_voxel_indices()
         ]
 
     def _calculate_phase_voxel_centroids(self):
@@ -310,46 +481,53 @@ class CIPHERGeometry:
 
     def _calculate_grain_boundaries(self):
         grain_boundaries = {}
-        tot_num_calcs = sum(i.phase_pairs.shape[0] for i in self.interfaces)
-        calc_count = 0
+        GB_phase_pairs = []
+        GB_areas = []
+        graph = self.voxel_map.adjacency_graph
+        for int_idx, interface in enumerate(self.interfaces):
+            GB_area = graph.get_shared_area(interface.phase_pairs)
+            is_GB = GB_area > 0
+            GB_phase_pairs.extend((int_idx, i) for i in interface.phase_pairs[is_GB])
+            GB_areas.extend(GB_area[is_GB])
+
+        tot_num_calcs = len(GB_phase_pairs)
         report_each_pc = 5
-        num_iter_per_report = np.ceil(tot_num_calcs * report_each_pc / 100)
+        num_iter_per_report = max(np.ceil(tot_num_calcs * report_each_pc / 100), 1)
         print(f"Identifying grain boundaries...", flush=True)
-        for int_idx, interface in enumerate(self.interfaces):
-            for phase_pair in interface.phase_pairs:
-                calc_count += 1
-                if calc_count % num_iter_per_report == 0:
-                    frac_done = (1 + calc_count) / tot_num_calcs * 100
-                    print(f"Identifying grain boundaries: {frac_done:.0f}%.", flush=True)
-                is_GB = np.any(np.all(self.neighbour_list == phase_pair[:, None], axis=0))
-                if is_GB:
-                    vox_bool = self.voxel_map.get_region_boundary_voxels(
-                        phase_pair[0], phase_pair[1]
-                    )
-                    vox_idx = np.where(vox_bool)
+        for calc_count, ((int_idx, phase_pair), GB_area) in enumerate(
+            zip(GB_phase_pairs, GB_areas), start=1
+        ):
+            if calc_count % num_iter_per_report == 0:
+                frac_done = calc_count / tot_num_calcs * 100
+                print(f"Identifying grain boundaries: {frac_done:.0f}%.", flush=True)
+            vox_bool = self.voxel_map.get_region_boundary_voxels(
+                phase_pair[0], phase_pair[1]
+            )
+            vox_idx = np.where(vox_bool)
 
-                    # remove edge GB voxels:
-                    for gs_idx, i in enumerate(self.grid_size):
-                        not_edge_idx = np.logical_not(
-                            np.logical_or(vox_idx[gs_idx] == 0, vox_idx[gs_idx] == i - 1)
-                        )
-                        vox_idx = list(vox_idx)
-                        for j_idx, _ in enumerate(vox_idx):
-                            vox_idx[j_idx] = vox_idx[j_idx][not_edge_idx]
-
-                    vox_idx = tuple(vox_idx)
-                    if not vox_idx[0].size:
-                        continue
-
-                    vox_coords = self.voxel_map.coordinates[vox_idx]
-                    GB_centroid = np.mean(vox_coords, axis=0)
-
-                    grain_boundaries[(phase_pair[0], phase_pair[1])] = {
-                        "interface_idx": int_idx,
-                        "voxel_indices": vox_idx,
-                        "voxel_coordinates": vox_coords,
-                        "centroid": GB_centroid,
-                    }
+            # remove edge GB voxels:
+            for gs_idx, i in enumerate(self.grid_size):
+                not_edge_idx = np.logical_not(
+                    np.logical_or(vox_idx[gs_idx] == 0, vox_idx[gs_idx] == i - 1)
+                )
+                vox_idx = list(vox_idx)
+                for j_idx, _ in enumerate(vox_idx):
+                    vox_idx[j_idx] = vox_idx[j_idx][not_edge_idx]
+
+            vox_idx = tuple(vox_idx)
+            if not vox_idx[0].size:
+                continue
+
+            vox_coords = self.voxel_map.get_voxel_coordinates(vox_idx)
+            GB_centroid = np.mean(vox_coords, axis=0)
+
+            grain_boundaries[(phase_pair[0], phase_pair[1])] = {
+                "interface_idx": int_idx,
+                "voxel_indices": vox_idx,
+                "voxel_coordinates": vox_coords,
+                "centroid": GB_centroid,
+                "area": GB_area,
+            }
         print(f"Finished grain boundaries.", flush=True)
         self._grain_boundaries = grain_boundaries
 
@@ -486,27 +664,96 @@ class CIPHERGeometry:
     def get_interface_map_indices(self, phase_type_A, phase_type_B):
         """Get an array of integer indices that index the (upper triangle of the) 2D
         symmetric interface map array, corresponding to a given material pair."""
+        chunks = list(self.iter_interface_map_indices(phase_type_A, phase_type_B))
+        if not chunks:
+            return np.zeros((2, 0), dtype=int)
+        return np.hstack(chunks)
+
+    def iter_interface_map_indices(self, phase_type_A, phase_type_B, chunk_size=None):
+        """Generate chunks of the integer indices that index the (upper triangle of the)
+        2D symmetric interface map array, corresponding to a given phase type pair.
+
+        Parameters
+        ----------
+        phase_type_A : str
+        phase_type_B : str
+        chunk_size : int, optional
+            Approximate maximum number of phase pairs in each chunk. Chunks always contain
+            whole rows of the interface map, so a chunk may exceed this size if a single
+            row does. By default, all phase pairs are yielded in a single chunk.
+
+        Yields
+        ------
+        ndarray of shape (2, N)
+            Phase pairs, with the smaller phase index first, sorted by the first phase
+            index and then the second phase index (across all chunks).
+
+        """
 
         # First get phase indices belonging to the two phase types:
         ptypes = {i.name: i for i in self.phase_types}
-        ptA_phases = ptypes[phase_type_A].phases
-        ptB_phases = ptypes[phase_type_B].phases
-
-        A_idx = np.repeat(ptA_phases, ptB_phases.shape[0])
-        B_idx = np.tile(ptB_phases, ptA_phases.shape[0])
+        ptA_phases = np.unique(ptypes[phase_type_A].phases)
+        ptB_phases = np.unique(ptypes[phase_type_B].phases)
+
+        if phase_type_A == phase_type_B:
+            # upper triangle (excluding the diagonal) of the phase list with itself:
+            rows = ptA_phases
+            partners = ptA_phases
+            starts = np.arange(1, rows.size + 1)
+            stops = np.full(rows.size, rows.size)
+        else:
+            # outer product of two distinct phase lists, mapped onto the upper triangle;
+            # each phase is paired with the larger phases of the other phase type:
+            rows = np.concatenate([ptA_phases, ptB_phases])
+            partners = np.concatenate([ptB_phases, ptA_phases])
+            starts = np.concatenate(
+                [
+                    np.searchsorted(ptB_phases, ptA_phases, side="right"),
+                    ptB_phases.size
+                    + np.searchsorted(ptA_phases, ptB_phases, side="right"),
+                ]
+            )
+            stops = np.concatenate(
+                [
+                    np.full(ptA_phases.size, ptB_phases.size),
+                    np.full(ptB_phases.size, partners.size),
+                ]
+            )
+            srt = np.argsort(rows, kind="stable")
+            rows, starts, stops = rows[srt], starts[srt], stops[srt]
 
-        map_idx = np.vstack((A_idx, B_idx))
-        map_idx_srt = np.sort(map_idx, axis=0)  # map onto upper triangle
-        map_idx_uniq = np.unique(map_idx_srt, axis=1)  # get unique pairs only
+        counts = stops - starts
+        has_pairs = counts > 0
+        rows, starts, counts = rows[has_pairs], starts[has_pairs], counts[has_pairs]
+        if not rows.size:
+            return
 
-        # remove diagonal elements (a phase can't have an interface with itself)
-        map_idx_non_trivial = map_idx_uniq[:, map_idx_uniq[0] != map_idx_uniq[1]]
+        # split rows into chunks of approximately `chunk_size` pairs:
+        if chunk_size is None:
+            bounds = np.array([0, rows.size])
+        else:
+            cumulative = np.cumsum(counts)
+            targets = np.arange(chunk_size, cumulative[-1], chunk_size)
+            bounds = np.unique(
+                np.concatenate(
+                    [[0], np.searchsorted(cumulative, targets, side="right"), [rows.size]]
+                )
+            )
 
-        return map_idx_non_trivial
+        for row_start, row_stop in zip(bounds[:-1], bounds[1:]):
+            counts_i = counts[row_start:row_stop]
+            offsets_i = np.cumsum(counts_i) - counts_i
+            local_idx = np.arange(counts_i.sum()) - np.repeat(offsets_i, counts_i)
+            first = np.repeat(rows[row_start:row_stop], counts_i)
+            second = partners[np.repeat(starts[row_start:row_stop], counts_i) + local_idx]
+            yield np.vstack((first, second))
 
-    def _get_interface_map(self, upper_tri_only=False, quiet=False):
+    def _get_interface_map(self, upper_tri_only=False, quiet=False, random_seed=None):
         """Generate the num_phases by num_phases symmetric matrix that maps each phase-pair
-        to an interface index."""
+        to an interface index. Phase pairs are randomly assigned to interfaces according
+        to their type fractions, using `random_seed`."""
+
+        rng = np.random.default_rng(seed=random_seed)
 
         if not quiet:
             print("Finding interface map matrix...", end="")
@@ -542,7 +789,6 @@ class CIPHERGeometry:
                         f"for all defined interfaces. You cannot mix them."
                     )
 
-            all_phase_pairs = self.get_interface_map_indices(*pt_pair).T
             if any_manual_set:
                 if not all_manual_set:
                     raise ValueError(
@@ -554,14 +800,8 @@ class CIPHERGeometry:
                 # check that given phase_pairs combine to the set of all phase_pairs
                 # for this material-material pair:
                 all_given_phase_pairs = np.vstack([i.phase_pairs for i in int_defs])
-
-                # sort by first-phase, then second-phase, for comparison:
-                srt = np.lexsort(all_given_phase_pairs.T[::-1])
-                all_given_phase_pairs = all_given_phase_pairs[srt]
-
-                if all_given_phase_pairs.shape != all_phase_pairs.shape or not np.all(
-                    all_given_phase_pairs == all_phase_pairs
-                ):
+                if not self._is_complete_phase_pair_set(pt_pair, all_given_phase_pairs):
+                    all_phase_pairs = self.get_interface_map_indices(*pt_pair).T
                     raise ValueError(
                         f"Missing `phase_pairs` for interface {pt_pair}. The following "
                         f"phase pairs must all be included for this interface: "
@@ -598,14 +838,34 @@ class CIPHERGeometry:
                         f"defined interfaces must sum to one."
                     )
 
+                if len(int_defs) == 1:
+                    # all phase pairs have the same interface, so no need to shuffle:
+                    int_i = int_defs[0]
+                    phase_pairs_i = []
+                    for chunk in self.iter_interface_map_indices(
+                        *pt_pair, chunk_size=INTERFACE_MAP_CHUNK_SIZE
+                    ):
+                        int_map[chunk[0], chunk[1]] = int_i.index
+                        if not upper_tri_only:
+                            int_map[chunk[1], chunk[0]] = int_i.index
+                        phase_pairs_i.append(chunk)
+                    int_i.phase_pairs = (
+                        np.hstack(phase_pairs_i).T
+                        if phase_pairs_i
+                        else np.zeros((0, 2), dtype=int)
+                    )
+                    int_i.type_fraction = None
+                    continue
+
                 # assign phase_pairs according to type fractions:
+                all_phase_pairs = self.get_interface_map_indices(*pt_pair).T
                 num_pairs = all_phase_pairs.shape[0]
                 type_nums_each = [round(i * num_pairs) for i in type_fracs]
                 type_nums = np.cumsum(type_nums_each)
                 if num_pairs % 2 == 1:
                     type_nums += 1
 
-                shuffle_idx = np.random.choice(num_pairs, size=num_pairs, replace=False)
+                shuffle_idx = rng.permutation(num_pairs)
                 phase_pairs_shuffled = all_phase_pairs[shuffle_idx]
                 phase_pairs_split = np.split(phase_pairs_shuffled, type_nums, axis=0)[:-1]
                 for idx, int_i in enumerate(int_defs):
@@ -621,12 +881,37 @@ class CIPHERGeometry:
 
         return int_map
 
+    def _is_complete_phase_pair_set(self, phase_type_pair, phase_pairs):
+        """Check if some phase pairs (of shape (N, 2)) are exactly the set of all phase
+        pairs for a given phase type pair, without generating the full set at once."""
+
+        phase_pairs = np.sort(np.asarray(phase_pairs).reshape(-1, 2), axis=1)
+        base = int(max(self.known_phases.max(initial=0), phase_pairs.max(initial=0))) + 1
+        given_keys = np.unique(encode_pair_keys(phase_pairs.T, base))
+        if given_keys.size != phase_pairs.shape[0]:
+            return False  # repeated phase pairs
+
+        num_pairs = 0
+        for chunk in self.iter_interface_map_indices(
+            *phase_type_pair, chunk_size=INTERFACE_MAP_CHUNK_SIZE
+        ):
+            num_pairs += chunk.shape[1]
+            if num_pairs > given_keys.size:
+                return False
+            chunk_keys = encode_pair_keys(chunk, base)
+            pos = np.searchsorted(given_keys, chunk_keys)
+            pos[pos == given_keys.size] = 0
+            if not np.all(given_keys[pos] == chunk_keys):
+                return False
+
+        return num_pairs == given_keys.size
+
     @property
     def interface_map_int(self):
         """Get the interface map as an integer matrix, where NaNs are replaced by -2."""
         int_map = np.copy(self.interface_map)
         int_map[np.isnan(int_map)] = -2
-        return int_map.astype(int)
+        return int_map.astype(get_smallest_int_dtype(len(self.interfaces) - 1, -2))
 
     def get_interface_idx(self):
         """Get the interface index associated with each voxel."""
@@ -648,6 +933,7 @@ class CIPHERGeometry:
             raise ValueError(f"Interface index {interface_idx} invalid.")
         self._interface_map[phase_A, phase_B] = interface_idx
         self._interface_map[phase_B, phase_A] = interface_idx
+        self._invalidate_derived_fields()
 
     def _validate_interface_map(self):
         # check no missing interfaces:
@@ -660,9 +946,37 @@ class CIPHERGeometry:
                 f"definition: {phase_idx_int_is_nan}."
             )
 
-    def get_misorientation_matrix(self, degrees=True, overwrite=False):
+    def get_misorientation_matrix(
+        self,
+        degrees=True,
+        overwrite=False,
+        num_processes=1,
+        num_blocks=None,
+        progress_callback=None,
+    ):
         """Given phase type definitions that include orientation lists, get the
-        misorientation matrix between all pairs."""
+        misorientation matrix between all pairs.
+
+        Parameters
+        ----------
+        degrees : bool, optional
+            If True, return the misorientation matrix in degrees, otherwise in radians.
+        overwrite : bool, optional
+            If True, recompute the misorientation matrix even if it is already set.
+        num_processes : int, optional
+            Number of worker processes to use. If greater than one, blocks of rows of
+            the upper triangle of the matrix are computed on a process pool, with each
+            worker writing directly into a shared-memory matrix.
+        num_blocks : int, optional
+            Number of blocks into which the upper triangle is split. Blocks contain
+            approximately equal numbers of phase pairs. By default, four blocks per
+            process are used.
+        progress_callback : callable, optional
+            Called after each block is computed, with the number of phase pairs
+            completed so far and the total number of phase pairs. By default, progress is
+            printed.
+
+        """
 
         if self.misorientation_matrix is not None and not overwrite:
             print(
@@ -670,7 +984,6 @@ class CIPHERGeometry:
             )
             return
 
-        misori_matrix = np.zeros((self.num_phases, self.num_phases), dtype=float)
         all_oris = np.ones((self.num_phases, 4)) * np.nan
         for i in self.phase_types:
             all_oris[i.phases] = i.orientations
@@ -680,20 +993,54 @@ class CIPHERGeometry:
                 "Not all orientations are accounted for in the phase type definitions."
             )
 
-        all_oris = Orientation(all_oris, family="cubic")  # TODO: generalise symmetry
+        if progress_callback is None:
+            progress_callback = _print_misorientation_progress
 
-        misori_matrix = np.zeros((self.num_phases, self.num_phases), dtype=float)
-        for idx in range(self.num_phases):
-            print(
-                f"Finding misorientation for orientation {idx + 1}/{len(all_oris)}",
-                flush=True,
+        num_phases = self.num_phases
+        num_blocks = num_blocks or 4 * num_processes
+        blocks = _get_misorientation_row_blocks(num_phases, num_blocks)
+        num_total = num_phases * (num_phases - 1) // 2
+        num_done = 0
+
+        if num_processes > 1:
+            shm = shared_memory.SharedMemory(
+                create=True, size=max(num_phases**2 * np.dtype(float).itemsize, 1)
             )
-            ori_i = all_oris[idx : idx + 1]
-            other_oris = all_oris[idx + 1 :]
-            if other_oris.size:
-                disori_i = ori_i.disorientation(other_oris).as_axis_angle()[..., -1]
-                misori_matrix[idx, idx + 1 :] = disori_i
-                misori_matrix[idx + 1 :, idx] = disori_i
+            try:
+                shm_matrix = np.ndarray(
+                    (num_phases, num_phases), dtype=float, buffer=shm.buf
+                )
+                shm_matrix[:] = 0
+                with ProcessPoolExecutor(max_workers=num_processes) as executor:
+                    futures = [
+                        executor.submit(
+                            _get_misorientation_block,
+                            shm.name,
+                            num_phases,
+                            all_oris,
+                            row_start,
+                            row_stop,
+                        )
+                        for row_start, row_stop in blocks
+                    ]
+                    for future in as_completed(futures):
+                        num_done += future.result()
+                        progress_callback(num_done, num_total)
+                misori_matrix = np.copy(shm_matrix)
+                del shm_matrix  # release the buffer before closing
+            finally:
+                shm.close()
+                shm.unlink()
+        else:
+            misori_matrix = np.zeros((num_phases, num_phases), dtype=float)
+            for row_start, row_stop in blocks:
+                num_done += _fill_misorientation_rows(
+                    misori_matrix, all_oris, row_start, row_stop
+                )
+                progress_callback(num_done, num_total)
+
+        # only the upper triangle is computed:
+        misori_matrix += misori_matrix.T
 
         if degrees:
             misori_matrix = np.rad2deg(misori_matrix)
@@ -827,6 +1174,233 @@ class CIPHERGeometry:
             is_periodic=is_periodic,
         )
 
+    @classmethod
+    def from_power_voronoi(
+        cls,
+        interfaces,
+        materials,
+        grid_size,
+        size,
+        seeds=None,
+        radii=None,
+        num_phases=None,
+        size_distribution=None,
+        random_seed=None,
+        is_periodic=False,
+    ):
+        """Generate a geometry from a power (Laguerre) tessellation. Either specify
+        `seeds` and their `radii`, or `num_phases` and one of `radii` and
+        `size_distribution`, a distribution of seed radii from which to target a grain
+        size distribution (see `PowerVoronoi.get_random_radii`).
+
+        Seeds whose regions contain no voxels are removed.
+
+        """
+
+        if sum(i is not None for i in (seeds, num_phases)) != 1:
+            raise ValueError(f"Specify exactly one of `seeds` and `num_phases`")
+
+        if seeds is None:
+            vor_map = PowerVoronoi.from_random(
+                num_regions=num_phases,
+                region_radii=radii,
+                size_distribution=size_distribution,
+                grid_size=grid_size,
+                size=size,
+                is_periodic=is_periodic,
+                random_seed=random_seed,
+            )
+        else:
+            vor_map = PowerVoronoi(
+                region_seeds=seeds,
+                region_radii=radii,
+                grid_size=grid_size,
+                size=size,
+                is_periodic=is_periodic,
+            )
+
+        return cls(
+            voxel_map=vor_map,
+            materials=materials,
+            interfaces=interfaces,
+            size=size,
+            seeds=vor_map.seeds,
+            random_seed=random_seed,
+        )
+
+    def _get_resampling_factor(self, factor):
+        factor = np.broadcast_to(factor, (self.dimension,))
+        if not np.all((factor == np.round(factor)) & (factor >= 1)):
+            raise ValueError(f"Resampling `factor` must be a positive integer: {factor}.")
+        return factor.astype(int)
+
+    def coarsen(self, factor):
+        """Get a new geometry at a coarser resolution, where each block of voxels is
+        replaced by a single voxel, assigned to the most frequent phase in the block (or
+        the smallest such phase index, in the case of ties).
+
+        Phases that no longer appear are removed, and the remaining phases renumbered.
+
+        Parameters
+        ----------
+        factor : int or list of int
+            Block size along each dimension, which must divide the grid size.
+
+        """
+        factor = self._get_resampling_factor(factor)
+        if np.any(self.grid_size % factor):
+            raise ValueError(
+                f"Coarsening `factor` ({factor}) must divide the grid size "
+                f"({self.grid_size})."
+            )
+        return self._get_compacted(get_block_mode(self.voxel_phase, factor))
+
+    def refine(self, factor):
+        """Get a new geometry at a finer resolution, where each voxel is replaced by a
+        block of voxels of the same phase.
+
+        Parameters
+        ----------
+        factor : int or list of int
+            Block size along each dimension.
+
+        """
+        voxel_phase = self.voxel_phase
+        for axis, factor_i in enumerate(self._get_resampling_factor(factor)):
+            voxel_phase = np.repeat(voxel_phase, factor_i, axis=axis)
+        return self._get_compacted(voxel_phase)
+
+    def crop(self, ranges):
+        """Get a new geometry from a sub-volume of the voxel grid.
+
+        Phases that do not appear in the sub-volume are removed, and the remaining phases
+        renumbered. The new geometry is not periodic, and its seeds (if there is one per
+        phase) are shifted so that they are relative to the corner of the sub-volume.
+
+        Parameters
+        ----------
+        ranges : list of tuple of (int, int)
+            Start and stop voxel index along each dimension of `voxel_phase`. As for
+            slices, either may be None, and negative indices count from the end.
+
+        """
+        if len(ranges) != self.dimension:
+            raise ValueError(
+                f"Specify one index range for each of the {self.dimension} dimensions."
+            )
+        slices = tuple(
+            slice(*slice(*range_i).indices(grid_size_i)[:2])
+            for range_i, grid_size_i in zip(ranges, self.grid_size)
+        )
+        voxel_phase = self.voxel_phase[slices]
+        if not voxel_phase.size:
+            raise ValueError(f"Index ranges {ranges!r} select no voxels.")
+
+        corner_idx = tuple(np.array([i.start]) for i in slices)
+        seeds = self.seeds
+        if seeds.ndim == 2:
+            seeds = seeds - self.voxel_map.get_voxel_coordinates(corner_idx)
+
+        return self._get_compacted(
+            voxel_phase,
+            size=self.size * np.array(voxel_phase.shape) / self.grid_size,
+            seeds=seeds,
+            is_periodic=False,
+        )
+
+    def _get_compacted(self, voxel_phase, size=None, seeds=None, is_periodic=None):
+        """Get a new geometry from a voxel phase map that contains a subset of the phases
+        of this geometry.
+
+        Phases that do not appear in `voxel_phase` are removed, and the remaining phases
+        are renumbered in order. Material, phase type (including orientations) and
+        interface definitions, and the interface and misorientation matrices, are carried
+        over for the remaining phases, using a lookup table from old to new phase indices.
+        Phase types (and materials) left without phases, and interfaces left without
+        phase pairs, are dropped.
+
+        """
+        present = np.unique(voxel_phase)
+        phase_map = np.full(self.num_known_phases, -1, dtype=int)
+        phase_map[present] = np.arange(present.size)
+
+        materials = []
+        for mat in self.materials:
+            phase_types = []
+            for phase_type in mat.phase_types:
+                phases = phase_map[phase_type.phases]
+                is_kept = phases >= 0
+                if not np.any(is_kept):
+                    continue
+                oris = phase_type.orientations
+                phase_types.append(
+                    PhaseTypeDefinition(
+                        type_label=phase_type.type_label,
+                        phases=phases[is_kept],
+                        orientations=oris[is_kept] if oris is not None else None,
+                    )
+                )
+            if phase_types:
+                materials.append(
+                    MaterialDefinition(
+                        name=mat.name,
+                        properties=copy.deepcopy(mat.properties),
+                        phase_types=phase_types,
+                    )
+                )
+
+        interfaces = []
+        interface_idx_map = np.full(len(self.interfaces), -1, dtype=int)
+        for int_def in self.interfaces:
+            phase_pairs = phase_map[int_def.phase_pairs.astype(int)]
+            is_kept = np.all(phase_pairs >= 0, axis=1)
+            if not np.any(is_kept):
+                continue
+            metadata = None
+            if int_def.metadata:
+                metadata = {
+                    k: np.asarray(v)[is_kept] for k, v in int_def.metadata.items()
+                }
+            interface_idx_map[int_def.index] = len(interfaces)
+            interfaces.append(
+                InterfaceDefinition(
+                    properties=copy.deepcopy(int_def.properties),
+                    phase_types=int_def.phase_types,
+                    type_label=int_def.type_label,
+                    phase_pairs=phase_pairs[is_kept],
+                    metadata=metadata,
+                )
+            )
+
+        interface_map = self.interface_map[np.ix_(present, present)]
+        is_int = ~np.isnan(interface_map)
+        interface_map[is_int] = interface_idx_map[interface_map[is_int].astype(int)]
+
+        seeds = self.seeds if seeds is None else np.asarray(seeds)
+        if seeds.ndim == 2 and seeds.shape[0] == self.num_known_phases:
+            seeds = seeds[present]
+
+        geometry = CIPHERGeometry(
+            materials=materials,
+            interfaces=interfaces,
+            size=self.size if size is None else size,
+            seeds=seeds,
+            voxel_phase=phase_map[voxel_phase],
+            is_periodic=self.is_periodic if is_periodic is None else is_periodic,
+            random_seed=self.random_seed,
+            quiet=True,
+            interface_map=interface_map,
+        )
+        if self.misorientation_matrix is not None:
+            geometry._misorientation_matrix = self.misorientation_matrix[
+                np.ix_(present, present)
+            ]
+            geometry._misorientation_matrix_is_degrees = (
+                self.misorientation_matrix_is_degrees
+            )
+
+        return geometry
+
     @property
     def voxel_phase_3D(self):
         if self.dimension == 3:
@@ -843,7 +1417,7 @@ class CIPHERGeometry:
 
     @property
     def voxel_interface_idx(self):
-        return self.get_interface_idx()
+        return self._get_derived_field("voxel_interface_idx", self.get_interface_idx)
 
     @property
     def voxel_interface_idx_3D(self):
@@ -855,7 +1429,9 @@ class CIPHERGeometry:
 
     @property
     def voxel_interface(self):
-        return self.voxel_map.get_interface_voxels()
+        return self._get_derived_field(
+            "voxel_interface", self.voxel_map.get_interface_voxels
+        )
 
     @property
     def voxel_interface_3D(self):
@@ -894,32 +1470,30 @@ class CIPHERGeometry:
         if data_label not in allowed_data:
             raise ValueError(f"`data_label` must be one of: {allowed_data}.")
 
-        if data_label == "phase":
-            data = self.voxel_phase_3D
-        elif data_label == "material":
-            data = self.voxel_material_3D
-        elif data_label == "interface":
-            data = self.voxel_interface_3D
-        elif data_label == "interface_idx":
-            data = self.voxel_interface_idx_3D
-        elif data_label == "phase_neighbours":
-            data = self.voxel_phase_neighbours_3D
-        elif data_label == "grain_boundaries":
-            data = self.get_grain_boundary_map(as_3D=True)
-        elif data_label == "GB_misorientation":
-            data = self.voxel_map.get_interface_idx(misorientation_matrix, as_3D=True)
-        elif data_label == "IPF_z":
-            data = self.get_voxel_IPF(IPF_dir=None, as_3D=True)
-
-        data = np.copy(data)
-        if normal_dir == "x":
-            data = data[slice_index, :, :]
-        elif normal_dir == "y":
-            data = data[:, slice_index, :]
-        elif normal_dir == "z":
-            data = data[:, :, slice_index]
+        if data_label == "IPF_z":
+            # slice phases first, so we avoid computing colours for the whole volume:
+            phase_slice = self._get_3D_slice(self.voxel_phase_3D, slice_index, normal_dir)
+            data = self.get_phase_IPF(IPF_dir=None)[phase_slice]
+        else:
+            if data_label == "phase":
+                data = self.voxel_phase_3D
+            elif data_label == "material":
+                data = self.voxel_material_3D
+            elif data_label == "interface":
+                data = self.voxel_interface_3D
+            elif data_label == "interface_idx":
+                data = self.voxel_interface_idx_3D
+            elif data_label == "phase_neighbours":
+                data = self.voxel_phase_neighbours_3D
+            elif data_label == "grain_boundaries":
+                data = self.get_grain_boundary_map(as_3D=True)
+            elif data_label == "GB_misorientation":
+                data = self.voxel_map.get_interface_idx(misorientation_matrix, as_3D=True)
+            data = np.copy(self._get_3D_slice(data, slice_index, normal_dir))
 
         if include:
+            # excluded voxels are marked with -10, which requires a signed type:
+            data = data.astype(np.result_type(data, np.int8), copy=False)
             include_mask = data == include[0]
             for i in include[1:]:
                 include_mask = np.logical_or(include_mask, data == i)
@@ -928,6 +1502,16 @@ class CIPHERGeometry:
 
         return data
 
+    @staticmethod
+    def _get_3D_slice(data, slice_index, normal_dir):
+        if normal_dir == "x":
+            return data[slice_index, :, :]
+        elif normal_dir == "y":
+            return data[:, slice_index, :]
+        elif normal_dir == "z":
+            return data[:, :, slice_index]
+        return data
+
     def show_slice(
         self,
         slice_index=0,
@@ -1045,6 +1629,34 @@ class CIPHERGeometry:
         """Get the num_phases-by-num_phases matrix of interface indices."""
         return self._interface_map
 
+    @interface_map.setter
+    def interface_map(self, interface_map):
+        interface_map = np.asarray(interface_map, dtype=float)
+        shape = (self.num_known_phases,) * 2
+        if interface_map.shape != shape:
+            raise ValueError(f"`interface_map` must have shape {shape!r}.")
+
+        diag = np.diagonal(interface_map)
+        if not np.all(np.isnan(diag) | (diag == -1)):
+            raise ValueError("Diagonal entries of `interface_map` must be NaN or -1.")
+
+        if not np.array_equal(interface_map, interface_map.T, equal_nan=True):
+            raise ValueError("`interface_map` must be symmetric.")
+
+        off_diag = interface_map[~np.eye(shape[0], dtype=bool)]
+        off_diag = off_diag[~np.isnan(off_diag)]
+        is_bad = (off_diag != np.round(off_diag)) | (off_diag < 0)
+        is_bad |= off_diag >= len(self.interfaces)
+        if np.any(is_bad):
+            raise ValueError(
+                f"Off-diagonal entries of `interface_map` must be interface indices in "
+                f"range({len(self.interfaces)}), but found: {np.unique(off_diag[is_bad])}."
+            )
+
+        self._interface_map = interface_map
+        self._validate_interface_map()
+        self._invalidate_derived_fields()
+
     @property
     def interface_names(self):
         return [i.name for i in self.interfaces]
@@ -1113,28 +1725,35 @@ class CIPHERGeometry:
         if oris.shape != shape:
             raise ValueError(f"Phase orientations must have shape {shape!r}")
 
-        max_idx = 0
         for phase_type in self.phase_types:
-            ori_idx = np.arange(max_idx, max_idx + phase_type.num_phases)
-            max_idx = ori_idx[-1] + 1
-            phase_type.orientations = oris[ori_idx]
+            phase_type.orientations = oris[phase_type.phases]
 
         self._phase_orientation = self._get_phase_orientation()
+        self._phase_IPF = {}  # assigned by `get_phase_IPF`, keyed by IPF direction
+        self._invalidate_derived_fields()
 
     @property
     def voxel_material(self):
         """Get the material index of each voxel."""
-        return self.phase_material[self.voxel_phase]
+        return self._get_derived_field(
+            "voxel_material",
+            lambda: to_smallest_int_dtype(self.phase_material)[self.voxel_phase],
+        )
 
     @property
     def voxel_phase_type(self):
         """Get the phase type index of each voxel."""
-        return self.phase_phase_type[self.voxel_phase]
+        return self._get_derived_field(
+            "voxel_phase_type",
+            lambda: to_smallest_int_dtype(self.phase_phase_type)[self.voxel_phase],
+        )
 
     @property
     def voxel_orientation(self):
         """Get the quaternion of each voxel."""
-        return self.phase_orientation[self.voxel_phase]
+        return self._get_derived_field(
+            "voxel_orientation", lambda: self.phase_orientation[self.voxel_phase]
+        )
 
     @property
     def material_num_voxels(self):
@@ -1166,19 +1785,40 @@ class CIPHERGeometry:
     def seeds_grid(self):
         return np.round(self.grid_size * self.seeds / self.size, decimals=0).astype(int)
 
-    def get_voxel_IPF(self, IPF_dir=None, as_3D=False):
+    def get_phase_IPF(self, IPF_dir=None):
+        """Get the inverse pole figure colour of each phase, for a given direction.
+
+        Colours are cached for each IPF direction. Phases without an orientation have a
+        colour of NaN.
+
+        Parameters
+        ----------
+        IPF_dir : ndarray of shape (3,), optional
+            By default, the z-direction.
+
+        Returns
+        -------
+        ndarray of shape (num_known_phases, 3)
+
+        """
         if IPF_dir is None:
             IPF_dir = np.array([0, 0, 1])
-        vox_oris = self.voxel_orientation
-        dms_oris = Orientation(vox_oris.reshape((-1, 4)), family="cubic")
-        IPF = dms_oris.IPF_color(IPF_dir)
-        shape = list(vox_oris.shape[:-1]) + [3]
-        vox_IPF = IPF.reshape(shape)
-
-        if self.dimension == 2 and as_3D:
-            return np.transpose(vox_IPF, axes=(1, 0, 2))[:, :, None, :]
+        key = tuple(np.asarray(IPF_dir, dtype=float).tolist())
+        if key not in self._phase_IPF:
+            phase_IPF = np.ones((self.num_known_phases, 3)) * np.nan
+            has_ori = ~np.any(np.isnan(self.phase_orientation), axis=1)
+            if np.any(has_ori):
+                dms_oris = Orientation(self.phase_orientation[has_ori], family="cubic")
+                phase_IPF[has_ori] = dms_oris.IPF_color(np.asarray(IPF_dir))
+            self._phase_IPF[key] = phase_IPF
+        return self._phase_IPF[key]
+
+    def get_voxel_IPF(self, IPF_dir=None, as_3D=False):
+        phase_IPF = self.get_phase_IPF(IPF_dir)
+        if as_3D:
+            return phase_IPF[self.voxel_phase_3D]
         else:
-            return vox_IPF
+            return phase_IPF[self.voxel_phase]
 
     def remove_interface(self, interface_name):
         """Remove an interface from the geometry. This will invalidate the geometry if
@@ -1197,12 +1837,15 @@ class CIPHERGeometry:
 
         # realign indices in map that succeed the removed interface:
         self._interface_map[self._interface_map > idx] -= 1
+        self._invalidate_derived_fields()
 
         return interface, phase_pairs
 
     def get_grain_boundary_map(self, as_3D=False):
-        voxel_GBs = np.ones_like(self.voxel_phase, dtype=int) * -10
         GBs = self.get_grain_boundaries().values()
+        voxel_GBs = np.full(
+            self.voxel_phase.shape, -10, dtype=get_smallest_int_dtype(len(GBs), -10)
+        )
         for idx, GB_i in enumerate(GBs):
             voxel_GBs[GB_i["voxel_indices"]] = idx
 
@@ -1218,14 +1861,11 @@ class CIPHERGeometry:
         if misorientation_matrix is None:
             misorientation_matrix = self.misorientation_matrix
         for interface_i in self.interfaces:
-            pp_neighbours = []
-            for pp in interface_i.phase_pairs:
-                pp_is_neighbours = np.any(
-                    np.all(pp[:, None] == self.neighbour_list, axis=0)
-                )
-                if pp_is_neighbours:
-                    pp_neighbours.append(pp)
-            pp_neighbours = np.array(pp_neighbours)
+            pp_area = self.voxel_map.adjacency_graph.get_shared_area(
+                interface_i.phase_pairs
+            )
+            pp_is_neighbours = pp_area > 0
+            pp_neighbours = interface_i.phase_pairs[pp_is_neighbours]
             if pp_neighbours.size:
                 misoris = misorientation_matrix[pp_neighbours[:, 0], pp_neighbours[:, 1]]
                 energies_theta.append(
@@ -1234,6 +1874,7 @@ class CIPHERGeometry:
                         "mobility": interface_i.properties["mobility"]["m0"],
                         "misorientation": misoris,
                         "phase_pairs": pp_neighbours,
+                        "area": pp_area[pp_is_neighbours],
                     }
                 )
         return energies_theta
@@ -1324,3 +1965,137 @@ class CIPHERGeometry:
         )
         fig.layout.update(layout_args or {})
         return fig
+
+
+class CIPHERGeometrySnapshot(CIPHERGeometry):
+    """A lightweight geometry that represents the phase map of a given simulation output
+    increment.
+
+    The materials, interfaces, phase tables and interface map are shared with (and not
+    copied from) the parent geometry. Only the increment's `voxel_phase` is stored; the
+    voxel map, and all analyses derived from it, are computed lazily on first use.
+    Memoized voxel-level fields are recomputed if the parent geometry changes. A
+    snapshot compares equal to a `CIPHERGeometry` with the same content.
+
+    """
+
+    def __init__(
+        self,
+        parent,
+        voxel_phase,
+        time=None,
+        increment=None,
+        incremental_data_idx=None,
+        is_periodic=False,
+        derived_fields_cache=None,
+    ):
+        """
+        Parameters
+        ----------
+        parent : CIPHERGeometry
+            The geometry whose phase, material and interface tables are shared.
+        voxel_phase : ndarray of int
+            The phase map of this increment.
+        is_periodic : bool, optional
+            Whether the voxel map of this increment is periodic, which affects its
+            neighbours, grain boundaries and interface indices. False by default,
+            independently of the parent geometry.
+        derived_fields_cache : ArrayCache, optional
+            Cache of memoized voxel-level fields. By default, that of the parent
+            geometry, so that all snapshots of an output share one memory budget.
+
+        """
+
+        voxel_phase = to_smallest_int_dtype(voxel_phase)
+        if voxel_phase.ndim != parent.dimension:
+            raise ValueError(
+                f"`voxel_phase` implies {voxel_phase.ndim} dimensions, but the parent "
+                f"geometry has {parent.dimension} dimensions."
+            )
+
+        if derived_fields_cache is None:
+            derived_fields_cache = parent.derived_fields_cache
+        self.derived_fields_cache = derived_fields_cache
+        self._fingerprint = None  # assigned on first access of `fingerprint`
+        self._voxel_map = None  # assigned on first access of `voxel_map`
+        self._parent_fingerprint = None  # assigned by `_check_memoized_fields`
+
+        self.parent = parent
+        self.voxel_phase = voxel_phase
+        self.time = time
+        self.increment = increment
+        self.incremental_data_idx = incremental_data_idx
+        self._is_periodic = is_periodic
+
+        self.size = parent.size
+        self.seeds = np.asarray(None)
+        self.random_seed = parent.random_seed
+        self.allow_missing_phases = True
+
+        self._num_phases = None  # assigned on first access of `num_phases`
+
+        self._init_lazy_attributes()
+
+    @property
+    def voxel_map(self):
+        if self._voxel_map is None:
+            self._voxel_map = VoxelMap(
+                region_ID=self.voxel_phase,
+                size=self.size,
+                is_periodic=self.is_periodic,
+                quiet=True,
+            )
+        return self._voxel_map
+
+    @property
+    def num_phases(self):
+        if self._num_phases is None:
+            self._num_phases = self.present_phases.size
+        return self._num_phases
+
+    @property
+    def interfaces(self):
+        return self.parent.interfaces
+
+    @property
+    def materials(self):
+        return self.parent.materials
+
+    @property
+    def interface_map(self):
+        return self.parent.interface_map
+
+    @property
+    def phase_material(self):
+        return self.parent.phase_material
+
+    @property
+    def phase_phase_type(self):
+        return self.parent.phase_phase_type
+
+    @property
+    def phase_orientation(self):
+        return self.parent.phase_orientation
+
+    def get_phase_IPF(self, IPF_dir=None):
+        return self.parent.get_phase_IPF(IPF_dir)
+
+    def _check_memoized_fields(self):
+        """Invalidate memoized fields (and the fingerprint) if the parent geometry has
+        changed since they were computed."""
+        parent_fingerprint = self.parent.fingerprint
+        if parent_fingerprint != self._parent_fingerprint:
+            self._invalidate_derived_fields()
+            self._parent_fingerprint = parent_fingerprint
+
+    def remove_interface(self, interface_name):
+        raise TypeError(
+            "Cannot remove an interface from a geometry snapshot: interfaces are shared "
+            "with the parent geometry; modify those instead."
+        )
+
+    def _modify_interface_map(self, phase_A, phase_B, interface_idx):
+        raise TypeError(
+            "Cannot modify the interface map of a geometry snapshot: it is shared with "
+            "the parent geometry; modify that instead."
+        )
@@ -109,7 +109,7 @@ class InterfaceDefinition:
             self._is_phase_pairs_set = True
 
         if phase_pairs is None or len(phase_pairs) == 0:
-            phase_pairs = np.array([]).reshape((0, 2))
+            phase_pairs = np.zeros((0, 2), dtype=int)
         else:
             phase_pairs = np.asarray(phase_pairs)
 
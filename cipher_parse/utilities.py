@@ -1,11 +1,13 @@
+import hashlib
 import json
+from collections import OrderedDict
 from importlib import resources
 import math
 from pathlib import Path
 from functools import reduce
 
 import numpy as np
-from scipy.spatial import Voronoi, Delaunay
+from scipy.spatial import Voronoi, Delaunay, KDTree
 from plotly import graph_objects
 from plotly.colors import qualitative
 from plotly.subplots import make_subplots
@@ -16,6 +18,96 @@ from ipywidgets import interact
 from cipher_parse.quats import axang2quat
 
 
+class ArrayCache:
+    """A least-recently-used cache of arrays, whose total size is bounded by a memory
+    budget.
+
+    Attributes
+    ----------
+    max_bytes : int or None
+        Memory budget in bytes. If adding an array would exceed the budget, the least
+        recently used arrays are evicted. Arrays larger than the budget are not cached. If
+        None, the cache is unbounded.
+
+    """
+
+    def __init__(self, max_bytes=None):
+        self.max_bytes = max_bytes
+        self._items = OrderedDict()
+
+    def __contains__(self, key):
+        return key in self._items
+
+    def __len__(self):
+        return len(self._items)
+
+    @property
+    def num_bytes(self):
+        return sum(i.nbytes for i in self._items.values())
+
+    def get(self, key, func):
+        """Get a cached array, or generate it by calling `func` and then cache it.
+
+        Cached arrays are set to be read-only, since they are shared between callers.
+
+        """
+        if key in self._items:
+            self._items.move_to_end(key)
+            return self._items[key]
+
+        value = np.asarray(func())
+        if self.max_bytes is not None and value.nbytes > self.max_bytes:
+            return value
+
+        value.flags.writeable = False
+        self._items[key] = value
+        self._evict()
+        return value
+
+    def _evict(self):
+        if self.max_bytes is None:
+            return
+        num_bytes = self.num_bytes
+        while num_bytes > self.max_bytes and self._items:
+            _, value = self._items.popitem(last=False)
+            num_bytes -= value.nbytes
+
+    def clear(self):
+        self._items.clear()
+
+
+def _update_fingerprint(hasher, obj):
+    """Recursively feed an object into a hash, in a way that is independent of dict
+    ordering and distinguishes between containers, arrays and scalars."""
+    if isinstance(obj, dict):
+        hasher.update(b"dict")
+        for key in sorted(obj, key=str):
+            _update_fingerprint(hasher, str(key))
+            _update_fingerprint(hasher, obj[key])
+    elif isinstance(obj, (list, tuple)):
+        hasher.update(f"list{len(obj)}".encode())
+        for i in obj:
+            _update_fingerprint(hasher, i)
+    elif isinstance(obj, np.ndarray) and obj.dtype != object:
+        hasher.update(f"array{obj.dtype.str}{obj.shape}".encode())
+        hasher.update(np.ascontiguousarray(obj).data)
+    elif isinstance(obj, np.ndarray):
+        _update_fingerprint(hasher, obj.tolist())
+    else:
+        if isinstance(obj, np.generic):
+            obj = obj.item()
+        hasher.update(f"{type(obj).__name__}:{obj!r}".encode())
+
+
+def get_fingerprint(*objs):
+    """Get a stable hexadecimal content hash of (nested) dicts, lists, arrays and
+    scalars."""
+    hasher = hashlib.blake2b(digest_size=16)
+    for obj in objs:
+        _update_fingerprint(hasher, obj)
+    return hasher.hexdigest()
+
+
 def euclidean_distance_matrix(a, b):
     return np.linalg.norm(a[:, None, :] - b[None, :, :], axis=-1)
 
@@ -55,8 +147,22 @@ def get_coordinate_grid(size, grid_size):
     return coords, element_size
 
 
+# approximate maximum number of elements of the voxel-seed distance matrix that are
+# computed at once by `DiscreteVoronoi`:
+DISTANCE_CHUNK_ELEMENTS = 2**22
+
+
 class DiscreteVoronoi:
-    def __init__(self, seeds, grid_size, size=None, periodic=False, use_scipy=False):
+    def __init__(
+        self,
+        seeds,
+        grid_size,
+        size=None,
+        periodic=False,
+        use_scipy=False,
+        use_kdtree=False,
+        chunk_size=None,
+    ):
         """
         Parameters
         ----------
@@ -67,6 +173,14 @@ class DiscreteVoronoi:
             If not specified, a unit square/box is used.
         periodic : bool, optional
             Should the seeds and box be considered periodic. By default, False.
+        use_kdtree : bool, optional
+            If True, find the closest seed of each voxel with a KDTree query, which is
+            much faster for many seeds. Assignments are identical to the default, except
+            possibly for voxels that are equidistant from two seeds.
+        chunk_size : int, optional
+            Number of voxels whose distances to all seeds are computed at once, if
+            neither `use_scipy` nor `use_kdtree` are True. By default, chunks of
+            approximately `DISTANCE_CHUNK_ELEMENTS` distances are used.
 
         """
 
@@ -85,13 +199,13 @@ class DiscreteVoronoi:
         self.periodic = periodic
 
         self.element_size, self.coords, self.voxel_assignment = self._assign_voxels(
-            use_scipy
+            use_scipy, use_kdtree, chunk_size
         )
 
         self.coords_flat = self.coords.reshape(-1, self.dimension)
         self.voxel_assignment_flat = self.voxel_assignment.reshape(-1)
 
-    def _assign_voxels(self, use_scipy):
+    def _assign_voxels(self, use_scipy, use_kdtree=False, chunk_size=None):
         """Assign voxels to their closest seed point.
 
         Returns
@@ -129,13 +243,23 @@ class DiscreteVoronoi:
                     voxels_in_idx = np.where(voxels_in)
                     voxel_assignment[voxels_in_idx] = seed_idx
                     # print(f'voxel assignment now: \n{voxel_assignment}')
-        else:
+        elif use_kdtree:
+            _, nearest_seed_idx = KDTree(seed_data).query(coords_flat, workers=-1)
+            voxel_assignment = nearest_seed_idx.reshape(coords.shape[:-1])
 
-            # shape (num coords, num seeds)
-            dist = euclidean_distance_matrix(coords_flat, seed_data)  # BIG!
+        else:
+            if chunk_size is None:
+                chunk_size = max(DISTANCE_CHUNK_ELEMENTS // seed_data.shape[0], 1)
+
+            # Assign each grid element to the nearest seed point, computing distances
+            # for a chunk of grid elements at a time:
+            nearest_seed_idx = np.empty(coords_flat.shape[0], dtype=int)
+            for start in range(0, coords_flat.shape[0], chunk_size):
+                stop = start + chunk_size
+                # shape (chunk size, num seeds):
+                dist = euclidean_distance_matrix(coords_flat[start:stop], seed_data)
+                nearest_seed_idx[start:stop] = np.argmin(dist, axis=1)
 
-            # Assign each grid element to the nearest seed point
-            nearest_seed_idx = np.argmin(dist, axis=1)  # shape (num coords,)
             voxel_assignment = nearest_seed_idx.reshape(coords.shape[:-1])
 
         if self.periodic:
@@ -681,6 +805,98 @@ def generate_energy_widget(
     return fig
 
 
+def get_smallest_int_dtype(max_value, min_value=0):
+    """Get the smallest integer data type that can represent all values between
+    `min_value` and `max_value`. Unsigned types are used if `min_value` is not
+    negative."""
+    if min_value >= 0:
+        candidates = (np.uint8, np.uint16, np.uint32, np.uint64)
+    else:
+        candidates = (np.int8, np.int16, np.int32, np.int64)
+    for dtype in candidates:
+        info = np.iinfo(dtype)
+        if info.min <= min_value and max_value <= info.max:
+            return np.dtype(dtype)
+    raise ValueError(
+        f"No integer data type can represent values between {min_value} and "
+        f"{max_value}."
+    )
+
+
+def to_smallest_int_dtype(arr):
+    """Cast an array of integer values to the smallest integer data type that can
+    represent them."""
+    arr = np.asarray(arr)
+    if not arr.size:
+        return arr.astype(np.uint8)
+    return arr.astype(get_smallest_int_dtype(int(arr.max()), int(arr.min())), copy=False)
+
+
+def get_run_lengths(arr):
+    """Run-length encode a 1D array.
+
+    Returns
+    -------
+    nums : ndarray of int
+        Length of each run.
+    vals : ndarray
+        Value of each run.
+
+    """
+    arr = np.asarray(arr)
+    if not arr.size:
+        return np.zeros(0, dtype=int), arr[:0]
+    run_starts = np.concatenate([[0], np.flatnonzero(arr[1:] != arr[:-1]) + 1])
+    nums = np.diff(np.append(run_starts, arr.size))
+    return nums, arr[run_starts]
+
+
+def get_block_mode(arr, block_shape):
+    """Get the most frequent value within each of the non-overlapping blocks of an array,
+    where ties are resolved in favour of the smallest value.
+
+    Parameters
+    ----------
+    arr : ndarray
+    block_shape : list of int
+        Shape of each block. Each dimension of `arr` must be divisible by the
+        corresponding dimension of `block_shape`.
+
+    Returns
+    -------
+    ndarray of shape `arr.shape // block_shape`
+
+    """
+    arr = np.asarray(arr)
+    block_shape = tuple(int(i) for i in block_shape)
+    out_shape = tuple(i // j for i, j in zip(arr.shape, block_shape))
+    block_size = int(np.prod(block_shape))
+    if not arr.size:
+        return arr.reshape(out_shape)
+
+    # reshape to (num_blocks, block_size), and sort the values within each block:
+    blocks = arr.reshape([k for i, j in zip(out_shape, block_shape) for k in (i, j)])
+    blocks = blocks.transpose([*range(0, 2 * arr.ndim, 2), *range(1, 2 * arr.ndim, 2)])
+    flat = np.sort(blocks.reshape(-1, block_size), axis=1).reshape(-1)
+
+    # find runs of equal values, where each block starts a new run:
+    is_start = np.ones(flat.size, dtype=bool)
+    is_start[1:] = flat[1:] != flat[:-1]
+    is_start[::block_size] = True
+    run_starts = np.flatnonzero(is_start)
+    run_lengths = np.diff(np.append(run_starts, flat.size))
+    run_block = run_starts // block_size
+
+    # the first (i.e. smallest-valued) of the longest runs within each block:
+    max_lengths = np.maximum.reduceat(
+        run_lengths, np.flatnonzero(run_starts % block_size == 0)
+    )
+    is_mode = run_lengths == max_lengths[run_block]
+    _, first_mode = np.unique(run_block[is_mode], return_index=True)
+
+    return flat[run_starts[is_mode][first_mode]].reshape(out_shape)
+
+
 def get_array_edge_mask(arr):
     """Get a boolean mask array that is True at the edge elements of an array."""
     all_idx = np.indices(arr.shape)
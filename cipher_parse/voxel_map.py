@@ -1,24 +1,297 @@
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import h5py
 import numpy as np
 import pyvista as pv
-from cipher_parse.utilities import get_array_edge_mask
+
+from cipher_parse.utilities import get_run_lengths, to_smallest_int_dtype
+
+
+def encode_pair_keys(pairs, num_regions):
+    """Encode region pairs as single int64 keys, `a * num_regions + b`.
+
+    Parameters
+    ----------
+    pairs : ndarray of shape (2, N)
+    num_regions : int
+        Must be greater than the largest region ID in `pairs`.
+
+    """
+    pairs = np.asarray(pairs).astype(np.int64, copy=False)
+    return pairs[0] * num_regions + pairs[1]
+
+
+def decode_pair_keys(keys, num_regions):
+    """Decode int64 keys generated by `encode_pair_keys` into an array of shape (2, N)."""
+    return np.vstack(np.divmod(keys, num_regions))
+
+
+class RegionAdjacencyGraph:
+    """Graph of regions that share at least one voxel face, stored in compressed sparse
+    row (CSR) form.
+
+    Each undirected adjacency is stored twice, once for each ordering of the pair. For
+    region `a`, its neighbours are `indices[indptr[a]:indptr[a + 1]]` (sorted), and the
+    number and total area of the voxel faces shared with each neighbour are the
+    corresponding elements of `num_faces` and `area`.
+
+    """
+
+    def __init__(self, indptr, indices, num_faces, area):
+        self.indptr = np.asarray(indptr)
+        self.indices = np.asarray(indices)
+        self.num_faces = np.asarray(num_faces)
+        self.area = np.asarray(area)
+        self._keys = None  # assigned by `keys`
+
+    @classmethod
+    def from_voxel_map(cls, voxel_map):
+        """Build the graph in a single pass over the region boundary faces of a
+        `VoxelMap`, processing slabs in parallel if `voxel_map.num_threads > 1`."""
+
+        base = voxel_map.pair_key_base
+        spacing = voxel_map.spacing
+
+        def reduce_slab_faces(start, stop):
+            # reduce each group of faces as we go, so memory scales with the number of
+            # region pairs rather than the number of faces:
+            keys, num_faces, face_area = [], [], []
+            for axis, region_lower, region_upper in voxel_map.get_slab_boundary_faces(
+                start, stop
+            ):
+                pairs = np.array([region_lower, region_upper])
+                keys_i, num_faces_i = np.unique(
+                    np.concatenate(
+                        [
+                            encode_pair_keys(pairs, base),
+                            encode_pair_keys(pairs[::-1], base),
+                        ]
+                    ),
+                    return_counts=True,
+                )
+                keys.append(keys_i)
+                num_faces.append(num_faces_i)
+                face_area.append(num_faces_i * np.prod(np.delete(spacing, axis)))
+            return keys, num_faces, face_area
+
+        keys = [np.zeros(0, dtype=np.int64)]
+        num_faces = [np.zeros(0, dtype=np.int64)]
+        face_area = [np.zeros(0, dtype=float)]
+        for keys_i, num_faces_i, face_area_i in voxel_map.map_slabs(reduce_slab_faces):
+            keys.extend(keys_i)
+            num_faces.extend(num_faces_i)
+            face_area.extend(face_area_i)
+
+        return cls._from_reduced_keys(
+            keys=np.concatenate(keys),
+            num_faces=np.concatenate(num_faces),
+            area=np.concatenate(face_area),
+            num_regions=base,
+        )
+
+    @classmethod
+    def _from_reduced_keys(cls, keys, num_faces, area, num_regions):
+        """Build the graph from (possibly repeated) directed edge keys, each with a
+        number of faces and an area, which are summed over repeated keys. Edges whose
+        total number of faces is zero are dropped."""
+        keys, inverse = np.unique(keys, return_inverse=True)
+        inverse = inverse.reshape(-1)
+        num_faces = np.bincount(inverse, weights=num_faces, minlength=keys.size)
+        num_faces = np.round(num_faces).astype(np.int64)
+        area = np.bincount(inverse, weights=area, minlength=keys.size)
+        is_edge = num_faces > 0
+        keys, num_faces, area = keys[is_edge], num_faces[is_edge], area[is_edge]
+
+        rows, indices = decode_pair_keys(keys, num_regions)
+        indptr = np.concatenate(
+            [[0], np.cumsum(np.bincount(rows, minlength=num_regions))]
+        )
+        graph = cls(indptr=indptr, indices=indices, num_faces=num_faces, area=area)
+        graph._keys = keys
+        return graph
+
+    def get_updated(self, removed_faces, added_faces, spacing, num_regions=None):
+        """Get a new graph with some voxel faces removed and others added.
+
+        Parameters
+        ----------
+        removed_faces, added_faces : list of tuple of (int, ndarray, ndarray)
+            The axis normal to each group of faces, and the region IDs either side of
+            each face (as yielded by `VoxelMap.iter_boundary_faces`). Faces between
+            voxels of the same region are ignored.
+        spacing : ndarray
+            Voxel spacing, used to find the face areas.
+        num_regions : int, optional
+            Number of regions of the new graph, if larger than the current number.
+
+        """
+        num_regions = max(num_regions or 0, self.num_regions)
+        rows, indices = self.get_edges()
+        keys = [encode_pair_keys(np.array([rows, indices]), num_regions)]
+        num_faces = [self.num_faces]
+        area = [self.area]
+        for sign, faces in ((-1, removed_faces), (1, added_faces)):
+            for axis, region_lower, region_upper in faces:
+                pairs = np.array([region_lower, region_upper])
+                pairs = pairs[:, pairs[0] != pairs[1]]
+                keys.extend(
+                    [
+                        encode_pair_keys(pairs, num_regions),
+                        encode_pair_keys(pairs[::-1], num_regions),
+                    ]
+                )
+                num_faces.append(np.full(2 * pairs.shape[1], sign))
+                area.append(
+                    np.full(2 * pairs.shape[1], sign * np.prod(np.delete(spacing, axis)))
+                )
+
+        return self._from_reduced_keys(
+            keys=np.concatenate(keys),
+            num_faces=np.concatenate(num_faces),
+            area=np.concatenate(area),
+            num_regions=num_regions,
+        )
+
+    def get_renumbered(self, region_map, num_regions):
+        """Get a new graph with regions renumbered according to `region_map`, an array
+        that maps old region IDs to new region IDs."""
+        edges = np.asarray(region_map)[self.get_edges()]
+        return self._from_reduced_keys(
+            keys=encode_pair_keys(edges, num_regions),
+            num_faces=self.num_faces,
+            area=self.area,
+            num_regions=num_regions,
+        )
+
+    @property
+    def num_regions(self):
+        return self.indptr.size - 1
+
+    @property
+    def num_edges(self):
+        """Number of directed edges; each pair of neighbouring regions is counted
+        twice."""
+        return self.indices.size
+
+    @property
+    def rows(self):
+        """The first region of each directed edge."""
+        return np.repeat(np.arange(self.num_regions), np.diff(self.indptr))
+
+    @property
+    def keys(self):
+        """Sorted int64 keys (see `encode_pair_keys`) of all directed edges."""
+        if self._keys is None:
+            self._keys = encode_pair_keys(
+                np.array([self.rows, self.indices]), self.num_regions
+            )
+        return self._keys
+
+    def get_edges(self):
+        """Get all directed edges as an array of shape (2, M), sorted
+        lexicographically."""
+        return np.array([self.rows, self.indices])
+
+    def get_neighbours(self, region):
+        """Get the neighbouring regions of a given region."""
+        return self.indices[self.indptr[region] : self.indptr[region + 1]]
+
+    def get_edge_index(self, pairs):
+        """Get the edge index of each of a set of region pairs.
+
+        Parameters
+        ----------
+        pairs : ndarray of shape (N, 2)
+
+        Returns
+        -------
+        ndarray of shape (N,)
+            Index into `indices`, `num_faces` and `area` of each pair, or -1 if the
+            regions are not neighbours.
+
+        """
+        pairs = np.asarray(pairs).reshape(-1, 2).T
+        edge_idx = np.full(pairs.shape[1], -1, dtype=np.int64)
+        if not pairs.size or not self.num_edges:
+            return edge_idx
+        in_range = np.all(np.logical_and(pairs >= 0, pairs < self.num_regions), axis=0)
+        keys = encode_pair_keys(pairs[:, in_range], self.num_regions)
+        pos = np.searchsorted(self.keys, keys)
+        pos_clipped = np.minimum(pos, self.num_edges - 1)
+        found = self.keys[pos_clipped] == keys
+        edge_idx[np.where(in_range)[0][found]] = pos_clipped[found]
+        return edge_idx
+
+    def has_edges(self, pairs):
+        """Check which of a set of region pairs (of shape (N, 2)) are neighbours."""
+        return self.get_edge_index(pairs) != -1
+
+    def get_shared_area(self, pairs):
+        """Get the area of the voxel faces shared by each of a set of region pairs (of
+        shape (N, 2)). Pairs that are not neighbours have zero area."""
+        edge_idx = self.get_edge_index(pairs)
+        area = np.zeros(edge_idx.size)
+        is_edge = edge_idx != -1
+        area[is_edge] = self.area[edge_idx[is_edge]]
+        return area
 
 
 class VoxelMap:
-    def __init__(self, region_ID, size, is_periodic, region_data=None, quiet=False):
+
+    chunk_size = None  # process the whole grid at once by default
+    num_threads = 1
+
+    def __init__(
+        self,
+        region_ID,
+        size,
+        is_periodic,
+        region_data=None,
+        quiet=False,
+        precompute=False,
+        num_threads=1,
+    ):
         """
         Parameters
         ---------
         region_ID : 2D or 3D array of integer IDs
+        quiet : bool, optional
+            If True, do not print progress when precomputing the neighbour voxels and
+            neighbour list. Progress is never printed when these are found on first
+            access.
+        precompute : bool, optional
+            If True, find the neighbour voxels and neighbour list on initialisation.
+            Otherwise (by default), these are found on first access.
+        num_threads : int, optional
+            If greater than one, the neighbour list, interface index and bulk voxel
+            kernels are run in parallel over slabs along the first axis, using a thread
+            pool of this size.
 
         """
 
-        self.region_ID = np.asarray(region_ID).astype(int)
+        self.region_ID = self._prepare_region_ID(region_ID)
+        self.region_ID_version = 0  # incremented when `region_ID` is edited in place
+        self.num_threads = num_threads
         self.size = np.asarray(size)
         self.is_periodic = is_periodic
 
-        self.neighbour_voxels = self.get_neighbour_voxels(quiet)
-        self.neighbour_list = self.get_neighbour_list(quiet)
-        self.num_regions = self.get_num_regions()
+        # assigned on first access of corresponding properties:
+        self._neighbour_voxels = None
+        self._neighbour_list = None
+        self._num_regions = None
+
+        self._coordinates = None  # assigned by `get_coordinates`
+        self._neighbour_pair_keys = None  # assigned by `get_neighbour_pair_keys`
+        self._neighbour_region = {}  # assigned by `get_neighbour_region`
+        self._region_ID_bulk = None  # assigned by `region_ID_bulk`
+        self._adjacency_graph = None  # assigned by `adjacency_graph`
+        self._region_num_voxels = None  # assigned by `region_num_voxels`
+
+        if precompute:
+            self._neighbour_voxels = self.get_neighbour_voxels(quiet)
+            self._neighbour_list = self.get_neighbour_list(quiet)
+            self._num_regions = self.get_num_regions()
 
         self.region_data = region_data or {}
 
@@ -32,7 +305,36 @@ class VoxelMap:
                 )
             self.region_data[k] = v
 
-        self._coordinates = None  # assigned by `get_coordinates`
+    @staticmethod
+    def _prepare_region_ID(region_ID):
+        region_ID = np.asarray(region_ID)
+        if not np.issubdtype(region_ID.dtype, np.integer):
+            region_ID = region_ID.astype(int)
+        return to_smallest_int_dtype(region_ID)
+
+    @property
+    def neighbour_voxels(self):
+        if self._neighbour_voxels is None:
+            self._neighbour_voxels = self.get_neighbour_voxels(quiet=True)
+        return self._neighbour_voxels
+
+    @property
+    def neighbour_list(self):
+        if self._neighbour_list is None:
+            self._neighbour_list = self.get_neighbour_list(quiet=True)
+        return self._neighbour_list
+
+    @property
+    def adjacency_graph(self):
+        if self._adjacency_graph is None:
+            self._adjacency_graph = RegionAdjacencyGraph.from_voxel_map(self)
+        return self._adjacency_graph
+
+    @property
+    def num_regions(self):
+        if self._num_regions is None:
+            self._num_regions = self.get_num_regions()
+        return self._num_regions
 
     @property
     def region_ID_flat(self):
@@ -73,6 +375,32 @@ class VoxelMap:
         coords = np.concatenate([i[..., None] for i in np.meshgrid(*mg_args)], axis=-1)
         return coords
 
+    def get_voxel_coordinates(self, voxel_idx):
+        """Get the coordinates of a subset of voxels from their indices, without
+        materialising the full `coordinates` array.
+
+        Parameters
+        ----------
+        voxel_idx : tuple of ndarray
+            Voxel indices along each axis, as returned by `np.nonzero`.
+
+        Returns
+        -------
+        ndarray of shape (N, dimension)
+            Identical to `coordinates[voxel_idx]`, so, as for the seeds, the first two
+            components are along the second and first array axes respectively.
+
+        """
+        # `coordinates` uses "xy" meshgrid indexing, so the first two axes are swapped:
+        axes_order = [1, 0, *range(2, self.dimension)]
+        return np.stack(
+            [
+                np.asarray(voxel_idx[axis]) * self.size[dim] / self.grid_size[dim]
+                for dim, axis in enumerate(axes_order)
+            ],
+            axis=-1,
+        )
+
     def generate_voxel_mask(self):
         voxel_mask = np.zeros(self.shape, dtype=int)
         return voxel_mask.astype(bool)
@@ -81,7 +409,9 @@ class VoxelMap:
         return np.unique(self.region_ID).size
 
     def get_neighbour_region(self, dimension: int, direction: int):
-        """
+        """Get the region ID of the neighbouring voxel along a given dimension and
+        direction, for all voxels.
+
         Parameters
         ----------
         dimension :
@@ -89,20 +419,40 @@ class VoxelMap:
         direction :
             Which direction to consider (-1, +1)
 
-        """
-
-        region = np.roll(self.region_ID, shift=direction, axis=dimension)
+        Notes
+        -----
+        The returned array is cached (and read-only), so each shifted array is only
+        computed once. Use `clear_neighbour_region_cache` if `region_ID` is modified.
 
-        if not self.is_periodic:
-            idx = 0 if direction == 1 else -1
-            if dimension == 0:
-                region[idx] = self.region_ID[idx]
-            elif dimension == 1:
-                region[:, idx] = self.region_ID[:, idx]
-            elif dimension == 2:
-                region[:, :, idx] = self.region_ID[:, :, idx]
-
-        return region
+        """
+        key = (dimension, direction)
+        if key not in self._neighbour_region:
+            region = np.roll(self.region_ID, shift=direction, axis=dimension)
+
+            if not self.is_periodic:
+                idx = 0 if direction == 1 else -1
+                if dimension == 0:
+                    region[idx] = self.region_ID[idx]
+                elif dimension == 1:
+                    region[:, idx] = self.region_ID[:, idx]
+                elif dimension == 2:
+                    region[:, :, idx] = self.region_ID[:, :, idx]
+
+            region.flags.writeable = False
+            self._neighbour_region[key] = region
+
+        return self._neighbour_region[key]
+
+    def clear_neighbour_region_cache(self):
+        """Clear cached neighbour region arrays and attributes derived from them."""
+        self._neighbour_region = {}
+        self._region_ID_bulk = None
+        self._neighbour_voxels = None
+        self._neighbour_list = None
+        self._neighbour_pair_keys = None
+        self._adjacency_graph = None
+        self._num_regions = None
+        self._region_num_voxels = None
 
     @property
     def region_ID_above(self):
@@ -136,27 +486,27 @@ class VoxelMap:
 
     @property
     def region_ID_diff_above(self):
-        return self.region_ID - self.region_ID_above != 0
+        return self.region_ID != self.region_ID_above
 
     @property
     def region_ID_diff_below(self):
-        return self.region_ID - self.region_ID_below != 0
+        return self.region_ID != self.region_ID_below
 
     @property
     def region_ID_diff_left(self):
-        return self.region_ID - self.region_ID_left != 0
+        return self.region_ID != self.region_ID_left
 
     @property
     def region_ID_diff_right(self):
-        return self.region_ID - self.region_ID_right != 0
+        return self.region_ID != self.region_ID_right
 
     @property
     def region_ID_diff_in(self):
-        return self.region_ID - self.region_ID_in != 0
+        return self.region_ID != self.region_ID_in
 
     @property
     def region_ID_diff_out(self):
-        return self.region_ID - self.region_ID_out != 0
+        return self.region_ID != self.region_ID_out
 
     @property
     def region_ID_diff_horz(self):
@@ -172,14 +522,16 @@ class VoxelMap:
 
     @property
     def region_ID_bulk(self):
-        out = np.logical_and(
-            np.logical_not(self.region_ID_diff_horz),
-            np.logical_not(self.region_ID_diff_vert),
-        )
-        if self.dimension == 3:
-            out = np.logical_and(out, np.logical_not(self.region_ID_diff_depth))
+        if self._region_ID_bulk is None:
+            out = np.empty(self.shape, dtype=bool)
+            for (start, stop), is_bulk in zip(
+                self.get_slab_ranges(), self.map_slabs(self._get_bulk_slab)
+            ):
+                out[start:stop] = is_bulk
+            out.flags.writeable = False
+            self._region_ID_bulk = out
 
-        return out
+        return self._region_ID_bulk
 
     def get_region_boundary_voxels(self, r1: int, r2: int):
         r1_vox = (self.region_ID == r1).astype(int)
@@ -213,128 +565,342 @@ class VoxelMap:
     def get_neighbour_voxels(self, quiet=False):
         if not quiet:
             print("Finding neighbouring voxels...", end="")
-        interface_voxels = np.copy(self.region_ID)
+        # signed, so bulk voxels can be marked with -1:
+        interface_voxels = self.region_ID.astype(np.result_type(self.region_ID, np.int8))
         interface_voxels[self.region_ID_bulk] = -1
         if not quiet:
             print("done!")
         return interface_voxels
 
     def get_interface_voxels(self):
-        interface_voxels = np.copy(self.region_ID)
+        interface_voxels = np.zeros(self.shape, dtype=np.int8)
         interface_voxels[self.region_ID_bulk] = -1
-        interface_voxels[interface_voxels != -1] = 0
         return interface_voxels
 
-    def get_neighbour_list(self, quiet=False):
-        """Get the pairs of regions that are neighbours"""
-        if not quiet:
-            print("Finding neighbour list...", end="")
-        region_boundary_above = np.array(
-            [self.region_ID_flat, self.region_ID_above.reshape(-1)]
-        )
-        region_boundary_left = np.array(
-            [self.region_ID_flat, self.region_ID_left.reshape(-1)]
-        )
-        region_boundary_below = np.array(
-            [self.region_ID_flat, self.region_ID_below.reshape(-1)]
-        )
-        region_boundary_right = np.array(
-            [self.region_ID_flat, self.region_ID_right.reshape(-1)]
-        )
+    def get_slab_ranges(self, chunk_size=None):
+        """Get the start and stop indices of slabs along the first axis.
+
+        Parameters
+        ----------
+        chunk_size : int, optional
+            Number of slices along the first axis in each slab. By default, `chunk_size`
+            of the voxel map is used. If that is None, the grid is split into
+            `num_threads` slabs.
 
-        region_boundary_all = np.concatenate(
-            (
-                region_boundary_above[:, self.region_ID_diff_above.reshape(-1)],
-                region_boundary_below[:, self.region_ID_diff_below.reshape(-1)],
-                region_boundary_left[:, self.region_ID_diff_left.reshape(-1)],
-                region_boundary_right[:, self.region_ID_diff_right.reshape(-1)],
-            ),
-            axis=1,
+        """
+        num_slices = self.shape[0]
+        chunk_size = (
+            chunk_size or self.chunk_size or int(np.ceil(num_slices / self.num_threads))
         )
+        return [
+            (start, min(start + chunk_size, num_slices))
+            for start in range(0, num_slices, max(chunk_size, 1))
+        ]
 
-        if self.dimension == 3:
-            region_boundary_in = np.array(
-                [self.region_ID_flat, self.region_ID_in.reshape(-1)]
-            )
-            region_boundary_out = np.array(
-                [self.region_ID_flat, self.region_ID_out.reshape(-1)]
-            )
-            region_boundary_all = np.concatenate(
-                (
-                    region_boundary_all,
-                    region_boundary_in[:, self.region_ID_diff_in.reshape(-1)],
-                    region_boundary_out[:, self.region_ID_diff_out.reshape(-1)],
-                ),
-                axis=1,
-            )
+    def map_slabs(self, func, chunk_size=None):
+        """Apply a function to each slab along the first axis, using a thread pool if
+        `num_threads > 1`.
+
+        Parameters
+        ----------
+        func : callable
+            Function with signature `func(start, stop)`.
+        chunk_size : int, optional
+            See `get_slab_ranges`.
+
+        Returns
+        -------
+        iterator
+            Return values of `func`, in slab order. When threaded, at most `num_threads`
+            slabs are in flight at once, so results are held in memory only until they
+            are consumed.
+
+        """
+        slab_ranges = self.get_slab_ranges(chunk_size)
+        if self.num_threads > 1 and len(slab_ranges) > 1:
+            return self._map_slabs_threaded(func, slab_ranges)
+        else:
+            return (func(*i) for i in slab_ranges)
+
+    def _map_slabs_threaded(self, func, slab_ranges):
+        # NumPy releases the GIL in the array operations that dominate each kernel:
+        with ThreadPoolExecutor(max_workers=self.num_threads) as executor:
+            futures = deque()
+            for start, stop in slab_ranges:
+                if len(futures) == self.num_threads:
+                    yield futures.popleft().result()
+                futures.append(executor.submit(func, start, stop))
+            while futures:
+                yield futures.popleft().result()
+
+    def iter_slabs(self, chunk_size=None):
+        """Iterate over slabs of `region_ID` along the first axis.
+
+        Parameters
+        ----------
+        chunk_size : int, optional
+            See `get_slab_ranges`.
+
+        Yields
+        ------
+        tuple of (int, int, ndarray)
+            The start and stop indices of the slab, and the slab region IDs.
+
+        """
+        for start, stop in self.get_slab_ranges(chunk_size):
+            yield start, stop, np.asarray(self.region_ID[start:stop])
+
+    def _get_slab_halos(self, start, stop):
+        """Get the region IDs of the slices adjacent to a slab along the first axis, or
+        None at the (non-periodic) grid edges."""
+        num_slices = self.shape[0]
+        if start > 0 or self.is_periodic:
+            lower = np.asarray(self.region_ID[(start - 1) % num_slices])
+        else:
+            lower = None
+        if stop < num_slices or self.is_periodic:
+            upper = np.asarray(self.region_ID[stop % num_slices])
+        else:
+            upper = None
+        return lower, upper
+
+    def _iter_slab_neighbours(self, region, lower_halo, upper_halo):
+        """Iterate over the neighbours of the voxels in a slab, in each direction.
+
+        Yields
+        ------
+        tuple of (tuple, ndarray, ndarray)
+            Index into the slab, and the region IDs of the indexed voxels and of their
+            neighbours in one direction. Voxels at non-periodic grid edges have no
+            neighbour in the outward direction.
+
+        """
+        for axis in range(self.dimension):
+            idx_lo = [slice(None)] * self.dimension
+            idx_hi = [slice(None)] * self.dimension
+            idx_lo[axis] = slice(1, None)
+            idx_hi[axis] = slice(None, -1)
+            idx_lo, idx_hi = tuple(idx_lo), tuple(idx_hi)
+            yield idx_lo, region[idx_lo], region[idx_hi]
+            yield idx_hi, region[idx_hi], region[idx_lo]
+
+            if axis == 0:
+                if lower_halo is not None:
+                    yield (0,), region[0], lower_halo
+                if upper_halo is not None:
+                    yield (-1,), region[-1], upper_halo
+            elif self.is_periodic:
+                idx_first = [slice(None)] * self.dimension
+                idx_last = [slice(None)] * self.dimension
+                idx_first[axis] = 0
+                idx_last[axis] = -1
+                idx_first, idx_last = tuple(idx_first), tuple(idx_last)
+                yield idx_first, region[idx_first], region[idx_last]
+                yield idx_last, region[idx_last], region[idx_first]
+
+    def _get_bulk_slab(self, start, stop):
+        """Get a mask of the voxels in a slab whose neighbours are all in the same
+        region."""
+        region = np.asarray(self.region_ID[start:stop])
+        is_bulk = np.ones(region.shape, dtype=bool)
+        for idx, centre, neighbour in self._iter_slab_neighbours(
+            region, *self._get_slab_halos(start, stop)
+        ):
+            is_bulk[idx] &= centre == neighbour
+        return is_bulk
+
+    def get_slab_boundary_faces(self, start, stop):
+        """Get the voxel faces within a slab (and between the slab and the next slab)
+        that separate two different regions.
+
+        Returns
+        -------
+        list of tuple of (int, ndarray, ndarray)
+            The axis normal to the faces, and the region IDs on the lower and upper side
+            of each face.
+
+        """
+        region = np.asarray(self.region_ID[start:stop])
+        _, region_next = self._get_slab_halos(start, stop)
+        faces = []
+        for axis in range(self.dimension):
+            lower = [slice(None)] * self.dimension
+            upper = [slice(None)] * self.dimension
+            lower[axis] = slice(None, -1)
+            upper[axis] = slice(1, None)
+            pairs = [(region[tuple(lower)], region[tuple(upper)])]
+            if axis == 0:
+                if region_next is not None:
+                    pairs.append((region[-1], region_next))
+            elif self.is_periodic:
+                lower[axis] = slice(-1, None)
+                upper[axis] = slice(None, 1)
+                pairs.append((region[tuple(lower)], region[tuple(upper)]))
+            for region_lower, region_upper in pairs:
+                is_boundary = region_lower != region_upper
+                faces.append((axis, region_lower[is_boundary], region_upper[is_boundary]))
+        return faces
+
+    def iter_boundary_faces(self, chunk_size=None):
+        """Iterate over the voxel faces that separate two different regions.
+
+        Each face is visited once. Faces on the periodic boundary are included only if
+        `is_periodic` is True. The grid is processed in slabs (see `get_slab_ranges`).
+
+        Yields
+        ------
+        tuple of (int, ndarray, ndarray)
+            The axis normal to the faces, and the region IDs on the lower and upper side
+            of each face.
+
+        """
+        for start, stop in self.get_slab_ranges(chunk_size):
+            yield from self.get_slab_boundary_faces(start, stop)
+
+    @property
+    def region_num_voxels(self):
+        if self._region_num_voxels is None:
+            self._region_num_voxels = self.get_region_num_voxels()
+        return self._region_num_voxels
+
+    def get_region_num_voxels(self, chunk_size=None):
+        """Get the number of voxels in each region, indexed by region ID."""
+        num_voxels = np.zeros(self.pair_key_base, dtype=np.int64)
+        for _, _, region in self.iter_slabs(chunk_size):
+            num_voxels += np.bincount(region.reshape(-1), minlength=num_voxels.size)
+        return num_voxels
+
+    def get_neighbour_list(self, quiet=False, return_counts=False):
+        """Get the pairs of regions that are neighbours.
+
+        Parameters
+        ----------
+        return_counts : bool, optional
+            If True, also return the number of voxel faces shared by each pair.
+
+        Returns
+        -------
+        neighbours : ndarray of shape (2, M)
+            Neighbouring region pairs, including both orderings of each pair, sorted
+            lexicographically.
+        counts : ndarray of shape (M,)
+            Number of shared voxel faces for each pair. Only returned if `return_counts`
+            is True.
+
+        """
+        if not quiet:
+            print("Finding neighbour list...", end="")
+
+        neighbours = self.adjacency_graph.get_edges()
 
-        neighbours = np.unique(region_boundary_all, axis=1)
         if not quiet:
             print("done!")
 
-        return neighbours
+        if return_counts:
+            return neighbours, self.adjacency_graph.num_faces
+        else:
+            return neighbours
 
-    def get_interface_idx(self, interface_map, as_3D=False):
-        interface_idx_above_flat = interface_map[
-            self.region_ID_flat, self.region_ID_above.reshape(-1)
-        ]
-        interface_idx_below_flat = interface_map[
-            self.region_ID_flat, self.region_ID_below.reshape(-1)
-        ]
-        interface_idx_left_flat = interface_map[
-            self.region_ID_flat, self.region_ID_left.reshape(-1)
-        ]
-        interface_idx_right_flat = interface_map[
-            self.region_ID_flat, self.region_ID_right.reshape(-1)
-        ]
+    @property
+    def pair_key_base(self):
+        """Multiplier used to encode region pairs as int64 keys."""
+        return int(self.region_ID.max()) + 1 if self.region_ID.size else 1
 
-        interface_idx_above = interface_idx_above_flat.reshape(self.shape)
-        interface_idx_below = interface_idx_below_flat.reshape(self.shape)
-        interface_idx_left = interface_idx_left_flat.reshape(self.shape)
-        interface_idx_right = interface_idx_right_flat.reshape(self.shape)
-
-        interface_idx_all = np.concatenate(
-            (
-                interface_idx_above[None],
-                interface_idx_below[None],
-                interface_idx_left[None],
-                interface_idx_right[None],
-            ),
-            axis=0,
-        )
+    def get_neighbour_pair_keys(self):
+        """Get the sorted int64 keys of all neighbouring region pairs, where each pair is
+        encoded with the smaller region ID first."""
+        if self._neighbour_pair_keys is None:
+            graph = self.adjacency_graph
+            self._neighbour_pair_keys = graph.keys[graph.rows < graph.indices]
+        return self._neighbour_pair_keys
 
-        if self.dimension == 3:
-            interface_idx_in_flat = interface_map[
-                self.region_ID_flat,
-                self.region_ID_in.reshape(-1),
-            ]
-            interface_idx_out_flat = interface_map[
-                self.region_ID_flat,
-                self.region_ID_out.reshape(-1),
-            ]
-            interface_idx_in = interface_idx_in_flat.reshape(self.shape)
-            interface_idx_out = interface_idx_out_flat.reshape(self.shape)
-
-            interface_idx_all = np.concatenate(
-                (
-                    interface_idx_all,
-                    interface_idx_in[None],
-                    interface_idx_out[None],
-                ),
-                axis=0,
-            )
+    def is_neighbour_pair(self, pairs):
+        """Check which of a set of region pairs are neighbours.
 
-        # avoid self-phase neighbour idx of -1:
-        interface_idx_all = np.sort(interface_idx_all, axis=0)[-1]
-        interface_idx_all[self.region_ID_bulk] = -1
+        Parameters
+        ----------
+        pairs : ndarray of shape (N, 2)
+            Region pairs to check. The order of regions within a pair does not matter.
 
-        if not self.is_periodic:
-            interface_idx_all[get_array_edge_mask(interface_idx_all)] = -1
+        Returns
+        -------
+        ndarray of bool of shape (N,)
+
+        """
+        return self.adjacency_graph.has_edges(pairs)
+
+    def get_interface_idx(self, interface_map, as_3D=False, chunk_size=None, out=None):
+        """Get, for each voxel, the maximum value of `interface_map` over the region
+        pairs formed with its face neighbours.
+
+        Bulk voxels (and edge voxels if not periodic) are assigned -1.
+
+        Parameters
+        ----------
+        interface_map : ndarray of shape (num_regions, num_regions)
+        as_3D : bool, optional
+            If True, return a 2D map as a 3D array with a single voxel in the third
+            dimension.
+        chunk_size : int, optional
+            If specified, process the grid in slabs of this many voxels along the first
+            axis, so that temporary arrays are bounded by the slab size rather than the
+            full grid size. See `get_slab_ranges`. Slabs are processed in parallel if
+            `num_threads > 1`.
+        out : ndarray, optional
+            Array of shape `shape` into which the result is written (e.g. a memory-mapped
+            array).
+
+        """
+        if out is None:
+            out = np.empty(self.shape, dtype=interface_map.dtype)
+
+        slab_ranges = self.get_slab_ranges(chunk_size)
+        slab_idx = self.map_slabs(
+            lambda start, stop: self._get_interface_idx_slab(interface_map, start, stop),
+            chunk_size,
+        )
+        for (start, stop), slab_idx_i in zip(slab_ranges, slab_idx):
+            out[start:stop] = slab_idx_i
 
         if self.dimension == 2 and as_3D:
-            return interface_idx_all.T[:, :, None]
+            return out.T[:, :, None]
         else:
-            return interface_idx_all
+            return out
+
+    def _get_interface_idx_slab(self, interface_map, start, stop):
+        """Get the interface index of the voxels in a slab of the first axis, using a
+        running maximum over neighbour directions."""
+
+        region = np.asarray(self.region_ID[start:stop])
+        dtype = interface_map.dtype
+        if np.issubdtype(dtype, np.floating):
+            init = -np.inf
+        else:
+            init = np.iinfo(dtype).min
+        slab_idx = np.full(region.shape, init, dtype=dtype)
+        is_boundary = np.zeros(region.shape, dtype=bool)
+
+        for idx, centre, neighbour in self._iter_slab_neighbours(
+            region, *self._get_slab_halos(start, stop)
+        ):
+            slab_idx_i = slab_idx[idx]
+            np.maximum(slab_idx_i, interface_map[centre, neighbour], out=slab_idx_i)
+            is_boundary[idx] |= centre != neighbour
+
+        slab_idx[~is_boundary] = -1
+
+        if not self.is_periodic:
+            if start == 0:
+                slab_idx[0] = -1
+            if stop == self.shape[0]:
+                slab_idx[-1] = -1
+            for axis in range(1, self.dimension):
+                idx_edge = [slice(None)] * self.dimension
+                for edge in (0, -1):
+                    idx_edge[axis] = edge
+                    slab_idx[tuple(idx_edge)] = -1
+
+        return slab_idx
 
     @property
     def grid_size_3D(self):
@@ -376,3 +942,151 @@ class VoxelMap:
         pl = pv.Plotter(notebook=True)
         pl.add_mesh(grid)
         pl.show()
+
+
+class ChunkedVoxelMap(VoxelMap):
+    """A voxel map whose `region_ID` is processed in slabs along the first axis, so that
+    it may be larger than the available memory.
+
+    `region_ID` can be any array-like that supports slicing along the first axis and has
+    `shape`, `ndim` and `dtype` attributes, such as a `numpy.memmap`, an `h5py.Dataset`
+    or a Zarr array. It is never loaded in full or cast to a larger data type.
+
+    Memory use is bounded by the slab size for: the neighbour list and adjacency graph,
+    the interface index (when written into a memory-mapped `out` array), the number of
+    voxels per region, and the YAML region ID mapping string. Other methods inherited
+    from `VoxelMap` may load the full grid.
+
+    """
+
+    def __init__(
+        self,
+        region_ID,
+        size,
+        is_periodic,
+        chunk_size=64,
+        region_data=None,
+        quiet=False,
+        num_threads=1,
+    ):
+        """
+        Parameters
+        ----------
+        region_ID : array-like of integer IDs
+        chunk_size : int, optional
+            Number of slices along the first axis in each slab.
+        num_threads : int, optional
+            Number of slabs to process in parallel.
+
+        """
+        self.chunk_size = chunk_size
+        self._pair_key_base = None  # assigned by `pair_key_base`
+        self._file = None  # assigned by `from_HDF5`
+        super().__init__(
+            region_ID=region_ID,
+            size=size,
+            is_periodic=is_periodic,
+            region_data=region_data,
+            quiet=quiet,
+            num_threads=num_threads,
+        )
+
+    @classmethod
+    def from_memmap(
+        cls, path, shape, dtype, size, is_periodic, chunk_size=64, mode="r", offset=0
+    ):
+        """Use a raw binary file of C-ordered region IDs as `region_ID`."""
+        region_ID = np.memmap(
+            path, dtype=dtype, mode=mode, shape=tuple(shape), offset=offset
+        )
+        return cls(region_ID, size=size, is_periodic=is_periodic, chunk_size=chunk_size)
+
+    @classmethod
+    def from_HDF5(cls, path, dataset_name, size, is_periodic, chunk_size=64):
+        """Use an HDF5 dataset as `region_ID`. The file is kept open until `close` is
+        called."""
+        file = h5py.File(path, "r")
+        obj = cls(
+            file[dataset_name], size=size, is_periodic=is_periodic, chunk_size=chunk_size
+        )
+        obj._file = file
+        return obj
+
+    def close(self):
+        """Close the HDF5 file, if `region_ID` is an HDF5 dataset."""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    @staticmethod
+    def _prepare_region_ID(region_ID):
+        return region_ID
+
+    @property
+    def num_voxels(self):
+        return int(np.prod(self.grid_size))
+
+    @property
+    def pair_key_base(self):
+        if self._pair_key_base is None:
+            max_ID = -1
+            for _, _, region in self.iter_slabs():
+                if region.size:
+                    max_ID = max(max_ID, int(region.max()))
+            self._pair_key_base = max_ID + 1 if max_ID >= 0 else 1
+        return self._pair_key_base
+
+    def get_num_regions(self):
+        return int(np.count_nonzero(self.get_region_num_voxels()))
+
+    def iter_region_ID_runs(self, offset=0):
+        """Iterate over runs of equal region IDs in Fortran (column-major) order.
+
+        The grid is processed in slabs along the last axis, and runs that span slab
+        boundaries are merged.
+
+        Parameters
+        ----------
+        offset : int, optional
+            Added to each region ID.
+
+        Yields
+        ------
+        tuple of (int, int)
+            The length of the run, and the (offset) region ID.
+
+        """
+        last_num, last_val = 0, None
+        num_slices = self.shape[-1]
+        for start in range(0, num_slices, self.chunk_size):
+            stop = min(start + self.chunk_size, num_slices)
+            slab = np.asarray(self.region_ID[..., start:stop])
+            nums, vals = get_run_lengths(
+                slab.flatten(order="F").astype(np.int64) + offset
+            )
+            if not vals.size:
+                continue
+            if vals[0] == last_val:
+                nums[0] += last_num
+            elif last_val is not None:
+                yield last_num, last_val
+            yield from zip(nums[:-1].tolist(), vals[:-1].tolist())
+            last_num, last_val = int(nums[-1]), int(vals[-1])
+
+        if last_val is not None:
+            yield last_num, last_val
+
+    def get_region_ID_string(self, offset=1, item_delim="\n"):
+        """Get the run-length encoded string of region IDs in Fortran (column-major)
+        order, as used for the `voxel_phase_mapping` in CIPHER input files.
+
+        Parameters
+        ----------
+        offset : int, optional
+            Added to each region ID; CIPHER region IDs are one-based.
+
+        """
+        return item_delim.join(
+            f"{n} of {v}" if n > 1 else f"{v}"
+            for n, v in self.iter_region_ID_runs(offset)
+        )
@@ -1,3 +1,4 @@
+from pathlib import Path
 from textwrap import dedent
 import pytest
 
@@ -388,3 +389,86 @@ def test_write_input_YAML_round_trip(tmp_path):
     inp.write_yaml(test_input_path)
     inp_reload = CIPHERInput.from_input_YAML_file(test_input_path)
     assert inp == inp_reload
+
+
+def test_write_random_voronoi_ensemble(tmp_path):
+    mat_props = {"chemicalenergy": "none", "molarvolume": 1e-5, "temperature0": 500.0}
+    int_props = {"energy": {"e0": 5e8}, "mobility": {"m0": 1e-11}, "width": 4.0}
+    kwargs = {
+        "num_realizations": 3,
+        "num_phases": 8,
+        "grid_size": [16, 16],
+        "size": [16, 16],
+        "materials": [
+            MaterialDefinition(name="mat1", properties=mat_props),
+            MaterialDefinition(name="mat2", properties=mat_props),
+        ],
+        "interfaces": [
+            InterfaceDefinition(materials=i, properties=int_props)
+            for i in (("mat1", "mat2"), ("mat2", "mat2"))
+        ]
+        + [
+            # phase pairs are randomly assigned to these according to type fraction:
+            InterfaceDefinition(
+                materials=("mat1", "mat1"),
+                properties=int_props,
+                type_label=label,
+                type_fraction=0.5,
+            )
+            for label in ("A", "B")
+        ],
+        "components": ["ti"],
+        "outputs": ["phaseid"],
+        "solution_parameters": {"initblocksize": [1, 1], "initrefine": 4},
+        "random_seed": 1,
+    }
+    manifest = CIPHERInput.write_random_voronoi_ensemble(tmp_path / "serial", **kwargs)
+    manifest_pool = CIPHERInput.write_random_voronoi_ensemble(
+        tmp_path / "pool", num_processes=2, **kwargs
+    )
+
+    assert len({i["random_seed"] for i in manifest}) == 3
+    assert [i["fingerprint"] for i in manifest] == [
+        i["fingerprint"] for i in manifest_pool
+    ]
+    assert (tmp_path / "serial" / "manifest.json").is_file()
+
+    # each realization can be regenerated from its seed in the manifest:
+    del kwargs["num_realizations"]
+    kwargs["random_seed"] = manifest[1]["random_seed"]
+    inp = CIPHERInput.from_random_voronoi(**kwargs)
+    assert inp.fingerprint == manifest[1]["fingerprint"]
+    inp_reload = CIPHERInput.from_input_YAML_file(manifest[1]["path"])
+    assert np.array_equal(inp.geometry.voxel_phase, inp_reload.geometry.voxel_phase)
+    assert np.array_equal(
+        inp.geometry.interface_map, inp_reload.geometry.interface_map, equal_nan=True
+    )
+    inp.write_yaml(tmp_path / "regenerated.yaml")
+    assert (tmp_path / "regenerated.yaml").read_text() == (
+        Path(manifest[1]["path"]).read_text()
+    )
+
+
+def test_input_fingerprint_cached():
+    mat_props = {"chemicalenergy": "none", "molarvolume": 1e-5, "temperature0": 500.0}
+    int_props = {"energy": {"e0": 5e8}, "mobility": {"m0": 1e-11}, "width": 4.0}
+    inp = CIPHERInput.from_random_voronoi(
+        num_phases=8,
+        grid_size=[16, 16],
+        size=[16, 16],
+        materials=[MaterialDefinition(name="mat1", properties=mat_props)],
+        interfaces=[
+            InterfaceDefinition(materials=("mat1", "mat1"), properties=int_props)
+        ],
+        components=["ti"],
+        outputs=["phaseid"],
+        solution_parameters={"initblocksize": [1, 1], "initrefine": 4},
+        random_seed=1,
+    )
+    fingerprint = inp.fingerprint
+    inp._fingerprint = (inp.geometry.fingerprint, "cached")
+    assert inp.fingerprint == "cached"
+
+    inp.geometry.interfaces[0].properties["width"] = 5.0
+    inp.geometry.interfaces = inp.geometry.interfaces
+    assert inp.fingerprint not in ("cached", fingerprint)
@@ -0,0 +1,455 @@
+import pytest
+import numpy as np
+from damask import Orientation, Rotation
+
+from cipher_parse.geometry import CIPHERGeometry, CIPHERGeometrySnapshot
+from cipher_parse.material import MaterialDefinition, PhaseTypeDefinition
+from cipher_parse.interface import InterfaceDefinition
+from cipher_parse.discrete_voronoi import DiscreteVoronoi, get_coordinate_grid
+from cipher_parse.utilities import ArrayCache
+
+
+def get_oriented_geometry(grid_size=[32, 32], num_phases=12, random_seed=0):
+    voronoi_obj = DiscreteVoronoi.from_random(
+        size=[1, 1],
+        grid_size=grid_size,
+        num_regions=num_phases,
+        random_seed=random_seed,
+    )
+    oris = Rotation.from_random(num_phases, rng_seed=random_seed).quaternion
+    materials = [
+        MaterialDefinition(
+            name="mat1",
+            properties={},
+            phase_types=[
+                PhaseTypeDefinition(phases=np.arange(num_phases), orientations=oris)
+            ],
+        )
+    ]
+    interfaces = [
+        InterfaceDefinition(
+            materials=("mat1", "mat1"),
+            properties={"energy": {"e0": 1.0}, "mobility": {"m0": 1.0}},
+        )
+    ]
+    return CIPHERGeometry(
+        voxel_map=voronoi_obj,
+        materials=materials,
+        interfaces=interfaces,
+        size=[1, 1],
+        quiet=True,
+    )
+
+
+def test_empty_interface_phase_pairs_are_integers():
+    materials = [
+        MaterialDefinition(
+            name="mat1",
+            properties={},
+            phase_types=[
+                PhaseTypeDefinition(type_label="A", phases=[0]),
+                PhaseTypeDefinition(type_label="B", phases=np.arange(1, 10)),
+            ],
+        )
+    ]
+    interfaces = [
+        InterfaceDefinition(phase_types=("mat1-A", "mat1-A"), properties={}),
+        InterfaceDefinition(phase_types=("mat1-A", "mat1-B"), properties={}),
+        InterfaceDefinition(phase_types=("mat1-B", "mat1-B"), properties={}),
+    ]
+    voronoi_obj = DiscreteVoronoi.from_random(
+        size=[1, 1], grid_size=[32, 32], num_regions=10, random_seed=2
+    )
+    geom = CIPHERGeometry(
+        voxel_map=voronoi_obj,
+        materials=materials,
+        interfaces=interfaces,
+        size=[1, 1],
+        quiet=True,
+    )
+    assert geom.interfaces[0].phase_pairs.shape == (0, 2)
+    assert all(i.phase_pairs.dtype.kind == "i" for i in geom.interfaces)
+
+
+def test_misorientation_matrix_parallel_equal_serial():
+    geom = get_oriented_geometry()
+    serial = geom.get_misorientation_matrix(progress_callback=lambda *_: None)
+    parallel = geom.get_misorientation_matrix(
+        overwrite=True, num_processes=2, progress_callback=lambda *_: None
+    )
+    assert np.allclose(serial, parallel)
+    assert np.allclose(parallel, parallel.T)
+
+
+def test_misorientation_matrix_progress_callback_total():
+    geom = get_oriented_geometry(num_phases=9)
+    progress = []
+    geom.get_misorientation_matrix(
+        num_blocks=3, progress_callback=lambda done, total: progress.append((done, total))
+    )
+    assert progress[-1] == (36, 36)
+
+
+def get_interface_map_indices_brute_force(phases_A, phases_B):
+    A_idx = np.repeat(phases_A, len(phases_B))
+    B_idx = np.tile(phases_B, len(phases_A))
+    map_idx = np.unique(np.sort(np.vstack((A_idx, B_idx)), axis=0), axis=1)
+    return map_idx[:, map_idx[0] != map_idx[1]]
+
+
+def get_two_phase_type_geometry(num_phases=10, oriented=False):
+    # phase types interleave, repeating the pattern of the first ten phases:
+    is_A = np.isin(np.arange(num_phases) % 10, [0, 3, 4, 8])
+    phases = {"A": np.flatnonzero(is_A), "B": np.flatnonzero(~is_A)}
+    oris = Rotation.from_random(num_phases, rng_seed=2).quaternion if oriented else None
+    materials = [
+        MaterialDefinition(
+            name="mat1",
+            properties={},
+            phase_types=[
+                PhaseTypeDefinition(
+                    type_label=label,
+                    phases=phases_i,
+                    orientations=None if oris is None else oris[phases_i],
+                )
+                for label, phases_i in phases.items()
+            ],
+        )
+    ]
+    interfaces = [
+        InterfaceDefinition(phase_types=("mat1-A", "mat1-A"), properties={}),
+        InterfaceDefinition(phase_types=("mat1-A", "mat1-B"), properties={}),
+        InterfaceDefinition(phase_types=("mat1-B", "mat1-B"), properties={}),
+    ]
+    voronoi_obj = DiscreteVoronoi.from_random(
+        size=[1, 1], grid_size=[32, 32], num_regions=num_phases, random_seed=2
+    )
+    return CIPHERGeometry(
+        voxel_map=voronoi_obj,
+        materials=materials,
+        interfaces=interfaces,
+        size=[1, 1],
+        quiet=True,
+    )
+
+
+def test_interface_map_indices_equal_brute_force():
+    geom = get_two_phase_type_geometry()
+    phases = {i.name: i.phases for i in geom.phase_types}
+    for pt_A, pt_B in [("mat1-A", "mat1-A"), ("mat1-A", "mat1-B"), ("mat1-B", "mat1-A")]:
+        expected = get_interface_map_indices_brute_force(phases[pt_A], phases[pt_B])
+        assert np.all(geom.get_interface_map_indices(pt_A, pt_B) == expected)
+
+
+def test_interface_map_indices_chunks_equal_full():
+    geom = get_two_phase_type_geometry()
+    full = geom.get_interface_map_indices("mat1-A", "mat1-B")
+    chunks = list(geom.iter_interface_map_indices("mat1-A", "mat1-B", chunk_size=5))
+    assert len(chunks) > 1
+    assert np.all(np.hstack(chunks) == full)
+
+
+def test_voxel_IPF_equal_per_voxel_orientations():
+    geom = get_oriented_geometry(grid_size=[16, 16])
+    vox_oris = geom.voxel_orientation.reshape(-1, 4)
+    expected = Orientation(vox_oris, family="cubic").IPF_color(np.array([0, 0, 1]))
+    assert np.allclose(geom.get_voxel_IPF().reshape(-1, 3), expected)
+
+
+def test_IPF_slice_equal_full_volume_slice():
+    geom = get_oriented_geometry(grid_size=[16, 16])
+    slice_IPF = geom.get_slice(data_label="IPF_z")
+    assert np.allclose(slice_IPF, geom.get_voxel_IPF(as_3D=True)[:, :, 0])
+
+
+def test_derived_fields_memoized_and_invalidated():
+    geom = get_two_phase_type_geometry()
+    int_idx = geom.voxel_interface_idx
+    assert geom.voxel_interface_idx is int_idx
+    interface = geom.interfaces[1]
+    geom._modify_interface_map(
+        phase_A=interface.phase_pairs[:, 0],
+        phase_B=interface.phase_pairs[:, 1],
+        interface_idx=0,
+    )
+    assert geom.voxel_interface_idx is not int_idx
+    assert np.all(geom.voxel_interface_idx == geom.get_interface_idx())
+
+
+def test_derived_fields_cache_shared_budget():
+    geom = get_two_phase_type_geometry()
+    field_bytes = geom.voxel_phase.size * np.dtype(np.int8).itemsize
+    cache = ArrayCache(max_bytes=3 * field_bytes)
+    snapshots = [
+        CIPHERGeometrySnapshot(
+            parent=geom,
+            voxel_phase=np.roll(geom.voxel_phase, i, axis=0),
+            derived_fields_cache=cache,
+        )
+        for i in range(4)
+    ]
+    int_idx = [i.voxel_interface_idx for i in snapshots]
+    assert all(i.nbytes == field_bytes for i in int_idx)
+    assert len(cache) == 3 and cache.num_bytes <= cache.max_bytes
+    assert snapshots[0].voxel_interface_idx is not int_idx[0]  # evicted
+    assert snapshots[3].voxel_interface_idx is int_idx[3]
+
+
+def test_geometry_snapshot_analyses_equal_full_geometry():
+    geom = get_two_phase_type_geometry()
+    assert geom.is_periodic
+    voxel_phase = np.copy(geom.voxel_phase)
+    voxel_phase[voxel_phase == 9] = 8  # phase 9 is consumed by phase 8
+
+    for is_periodic in (False, True):
+        snapshot = CIPHERGeometrySnapshot(
+            parent=geom, voxel_phase=voxel_phase, time=1.0, is_periodic=is_periodic
+        )
+        full = CIPHERGeometry(
+            materials=geom.materials,
+            interfaces=geom.interfaces,
+            size=geom.size,
+            voxel_phase=voxel_phase,
+            is_periodic=is_periodic,
+            allow_missing_phases=True,
+            quiet=True,
+        )
+        assert snapshot._voxel_map is None
+        assert snapshot.num_phases == full.num_phases == 9
+        assert np.all(snapshot.voxel_interface_idx == full.voxel_interface_idx)
+        assert np.all(snapshot.voxel_material == full.voxel_material)
+        assert np.all(snapshot.get_phase_num_voxels() == full.get_phase_num_voxels())
+        assert np.all(snapshot.neighbour_list == full.neighbour_list)
+        assert snapshot == full and full == snapshot
+
+
+def test_geometry_snapshot_not_periodic_by_default():
+    geom = get_two_phase_type_geometry()
+    snapshot = CIPHERGeometrySnapshot(parent=geom, voxel_phase=geom.voxel_phase)
+    assert geom.is_periodic and not snapshot.is_periodic
+    assert not snapshot.voxel_map.is_periodic
+
+
+def test_geometry_snapshot_invalidated_by_parent_change():
+    geom = get_two_phase_type_geometry()
+    snapshot = CIPHERGeometrySnapshot(
+        parent=geom, voxel_phase=geom.voxel_phase, is_periodic=geom.is_periodic
+    )
+    interface_idx = snapshot.voxel_interface_idx
+    geom.remove_interface(geom.interfaces[2].name)
+    assert not np.array_equal(snapshot.voxel_interface_idx, interface_idx)
+    assert np.array_equal(snapshot.voxel_interface_idx, geom.voxel_interface_idx)
+
+
+def test_geometry_snapshot_mutators_raise():
+    geom = get_two_phase_type_geometry()
+    snapshot = CIPHERGeometrySnapshot(parent=geom, voxel_phase=geom.voxel_phase)
+    with pytest.raises(TypeError):
+        snapshot.remove_interface(geom.interfaces[0].name)
+    with pytest.raises(TypeError):
+        snapshot._modify_interface_map(0, 1, 0)
+
+
+def test_compact_voxel_dtypes():
+    geom = get_two_phase_type_geometry()
+    assert geom.voxel_phase.dtype == np.uint8
+    assert geom.voxel_material.dtype == np.uint8
+    assert geom.interface_map_int.dtype == np.int8
+    assert geom.voxel_interface_idx.dtype == np.int8
+    assert np.all(
+        geom.get_slice(data_label="phase", include=[0])[geom.voxel_phase_3D[..., 0] != 0]
+        == -10
+    )
+
+
+def test_fingerprint():
+    geom_1 = get_oriented_geometry(random_seed=1)
+    geom_2 = get_oriented_geometry(random_seed=1)
+    geom_3 = get_oriented_geometry(random_seed=2)
+    assert geom_1.fingerprint == geom_2.fingerprint
+    assert geom_1.fingerprint != geom_3.fingerprint
+    assert geom_1 == geom_2
+    assert geom_1 != geom_3
+
+    fingerprint = geom_1.fingerprint
+    geom_1.phase_orientation = Rotation.from_random(12, rng_seed=5).quaternion
+    assert geom_1.fingerprint != fingerprint
+
+
+def test_eq_after_interface_edit():
+    geom_1 = get_oriented_geometry()
+    geom_2 = get_oriented_geometry()
+    assert geom_1 == geom_2  # computes the fingerprints
+    geom_1.interfaces[0].properties["energy"]["e0"] = 99.0
+    geom_1.interfaces = geom_1.interfaces
+    assert geom_1 != geom_2
+
+
+def test_interface_map_invalid_raise():
+    geom = get_two_phase_type_geometry()
+    int_map = geom.interface_map
+    num_ints = len(geom.interfaces)
+
+    bad_diagonal = np.copy(int_map)
+    bad_diagonal[0, 0] = 0
+    not_symmetric = np.copy(int_map)
+    not_symmetric[0, 1] = (not_symmetric[1, 0] + 1) % num_ints
+    out_of_range = np.copy(int_map)
+    out_of_range[[0, 1], [1, 0]] = num_ints
+    not_integer = np.copy(int_map)
+    not_integer[[0, 1], [1, 0]] = 0.5
+
+    for bad_map in (bad_diagonal, not_symmetric, out_of_range, not_integer):
+        with pytest.raises(ValueError):
+            geom.interface_map = bad_map
+    assert geom.interface_map is int_map
+
+
+def test_fingerprint_cached_and_invalidated_by_seed_edit():
+    geom = get_oriented_geometry()
+    fingerprint = geom.fingerprint
+    geom._fingerprint = "cached"
+    assert geom.fingerprint == "cached"
+    voxel_material = geom.voxel_material
+
+    geom.voxel_map.move_seed(0, geom.voxel_map.seeds[1] + 0.01)
+    assert geom.fingerprint != fingerprint
+    assert geom.voxel_material is not voxel_material
+
+
+def test_grain_boundary_area_JSON_round_trip():
+    geom = get_oriented_geometry()
+    GBs = geom.get_grain_boundaries()
+    GBs_rt = CIPHERGeometry.from_JSON(geom.to_JSON()).get_grain_boundaries()
+    assert GBs_rt.keys() == GBs.keys()
+    assert all(GBs_rt[i]["area"] == GBs[i]["area"] for i in GBs)
+
+
+def test_phase_centroids_without_coordinate_grid():
+    geom = get_oriented_geometry()
+    centroids = geom.get_phase_voxel_centroids()
+    assert geom.voxel_map._coordinates is None
+    expected = [
+        np.mean(geom.voxel_map.coordinates[np.nonzero(geom.voxel_phase == i)], axis=0)
+        for i in range(geom.num_phases)
+    ]
+    assert np.allclose(centroids, expected)
+
+
+def test_phase_orientation_setter_interleaved_phase_types():
+    geom = get_two_phase_type_geometry()
+    oris = Rotation.from_random(geom.num_phases, rng_seed=0).quaternion
+    geom.phase_orientation = oris
+    assert np.array_equal(geom.phase_orientation, oris)
+    for phase_type in geom.phase_types:
+        assert np.array_equal(phase_type.orientations, oris[phase_type.phases])
+
+
+def test_refine_coarsen_round_trip():
+    geom = get_two_phase_type_geometry(oriented=True)
+    geom_fine = geom.refine(2)
+    assert np.array_equal(geom_fine.grid_size, geom.grid_size * 2)
+    geom_rt = geom_fine.coarsen(2)
+    assert np.array_equal(geom_rt.voxel_phase, geom.voxel_phase)
+    assert np.array_equal(geom_rt.phase_orientation, geom.phase_orientation)
+    assert np.array_equal(geom_rt.interface_map, geom.interface_map, equal_nan=True)
+    assert [i.phases.tolist() for i in geom_rt.phase_types] == [
+        i.phases.tolist() for i in geom.phase_types
+    ]
+
+
+def test_coarsen_removes_phases():
+    geom = get_two_phase_type_geometry(num_phases=40, oriented=True)
+    oris = geom.phase_orientation
+    geom_coarse = geom.coarsen([8, 4])
+    assert np.array_equal(geom_coarse.grid_size, [4, 8])
+
+    # phases in the coarse geometry are the renumbered phases that remain:
+    present = np.unique(geom_coarse.voxel_phase)
+    assert np.array_equal(present, np.arange(geom_coarse.num_phases))
+    kept = np.unique(
+        [
+            np.bincount(block.reshape(-1)).argmax()
+            for row in np.split(geom.voxel_phase, 4, axis=0)
+            for block in np.split(row, 8, axis=1)
+        ]
+    )
+    assert geom_coarse.num_phases == kept.size < geom.num_phases
+    assert np.array_equal(geom_coarse.phase_orientation, oris[kept])
+    assert np.array_equal(geom_coarse.phase_phase_type, geom.phase_phase_type[kept])
+
+
+def test_crop():
+    geom = get_two_phase_type_geometry(num_phases=40, oriented=True)
+    oris = geom.phase_orientation
+    geom_crop = geom.crop([(4, 20), (8, None)])
+
+    voxel_phase = geom.voxel_phase[4:20, 8:]
+    kept = np.unique(voxel_phase)
+    assert np.array_equal(kept[geom_crop.voxel_phase], voxel_phase)
+    assert np.array_equal(geom_crop.grid_size, [16, 24])
+    assert np.allclose(geom_crop.size, [0.5, 0.75])
+    assert not geom_crop.is_periodic
+
+    assert np.array_equal(geom_crop.phase_orientation, oris[kept])
+    assert np.array_equal(geom_crop.phase_phase_type, geom.phase_phase_type[kept])
+    assert np.array_equal(
+        geom_crop.interface_map,
+        geom.interface_map[np.ix_(kept, kept)],
+        equal_nan=True,
+    )
+    for int_def in geom_crop.interfaces:
+        phase_pairs = int_def.phase_pairs.astype(int).T
+        assert np.all(geom_crop.interface_map[tuple(phase_pairs)] == int_def.index)
+
+
+def test_crop_shifts_seeds():
+    geom = get_oriented_geometry(num_phases=40)
+    geom.seeds = geom.voxel_map.seeds
+    geom_crop = geom.crop([(4, 20), (8, None)])
+
+    # each seed lies in a voxel of its own phase, before and after cropping:
+    for g in (geom, geom_crop):
+        seed_idx = np.floor(g.seeds[:, [1, 0]] / g.spacing).astype(int)
+        inside = np.all((seed_idx >= 0) & (seed_idx < g.grid_size), axis=1)
+        assert np.any(inside)
+        assert np.array_equal(
+            g.voxel_phase[tuple(seed_idx[inside].T)], np.nonzero(inside)[0]
+        )
+
+
+def test_crop_drops_empty_definitions_and_JSON_round_trip():
+    geom = get_two_phase_type_geometry()
+    geom_crop = geom.crop([(0, 8), (0, 8)])
+    assert len(geom_crop.phase_types) < len(geom.phase_types)
+    assert all(i.phases.size for i in geom_crop.phase_types)
+    assert all(i.phase_pairs.size for i in geom_crop.interfaces)
+    assert CIPHERGeometry.from_JSON(geom_crop.to_JSON()) == geom_crop
+
+
+def test_from_power_voronoi_equal_brute_force():
+    size, grid_size = np.array([1.0, 1.0]), [24, 24]
+    kwargs = {
+        "materials": [MaterialDefinition(name="mat1", properties={})],
+        "interfaces": [
+            InterfaceDefinition(materials=("mat1", "mat1"), properties={}),
+        ],
+        "grid_size": grid_size,
+        "size": size,
+    }
+    geom = CIPHERGeometry.from_power_voronoi(
+        **kwargs,
+        num_phases=15,
+        size_distribution={"mean": 0.1, "std": 0.05},
+        random_seed=1,
+    )
+    seeds, radii = geom.voxel_map.seeds, geom.voxel_map.radii
+    assert np.ptp(radii) > 0
+
+    coords, _ = get_coordinate_grid(size, grid_size)
+    power_dist = np.sum((coords[..., None, :] - seeds) ** 2, axis=-1) - radii**2
+    assert np.array_equal(geom.voxel_phase, np.argmin(power_dist, axis=-1))
+
+    kwargs["materials"] = [MaterialDefinition(name="mat1", properties={})]
+    geom_seeds = CIPHERGeometry.from_power_voronoi(**kwargs, seeds=seeds, radii=radii)
+    assert np.array_equal(geom_seeds.voxel_phase, geom.voxel_phase)
@@ -1,4 +1,15 @@
-from cipher_parse.utilities import get_subset_indices
+import numpy as np
+
+from cipher_parse.utilities import (
+    ArrayCache,
+    DiscreteVoronoi,
+    euclidean_distance_matrix,
+    get_block_mode,
+    get_coordinate_grid,
+    get_run_lengths,
+    get_smallest_int_dtype,
+    get_subset_indices,
+)
 
 
 def test_get_subset_indices():
@@ -38,3 +49,64 @@ def test_get_subset_indices_brute_force():
                     assert len(out_ij) == j
             except AssertionError:
                 raise AssertionError(f"{i} grab {j} length is {len(out_ij)}.")
+
+
+def test_array_cache_evicts_least_recently_used():
+    cache = ArrayCache(max_bytes=2 * 8 * 10)
+    cache.get("a", lambda: np.zeros(10))
+    cache.get("b", lambda: np.zeros(10))
+    cache.get("a", lambda: np.ones(10))  # cached, so "b" is now least-recently used
+    cache.get("c", lambda: np.zeros(10))
+    assert "a" in cache and "c" in cache and "b" not in cache
+    assert cache.num_bytes <= cache.max_bytes
+
+
+def test_array_cache_skips_arrays_over_budget():
+    cache = ArrayCache(max_bytes=8)
+    assert cache.get("a", lambda: np.zeros(10)).size == 10
+    assert len(cache) == 0
+
+
+def test_get_run_lengths():
+    nums, vals = get_run_lengths(np.array([3, 3, 1, 2, 2, 2, 3]))
+    assert np.array_equal(nums, [2, 1, 3, 1])
+    assert np.array_equal(vals, [3, 1, 2, 3])
+
+
+def test_get_smallest_int_dtype():
+    assert get_smallest_int_dtype(255) == np.uint8
+    assert get_smallest_int_dtype(256) == np.uint16
+    assert get_smallest_int_dtype(127, -2) == np.int8
+    assert get_smallest_int_dtype(128, -2) == np.int16
+
+
+def test_discrete_voronoi_chunked_equal_full_distance_matrix():
+    seeds = np.random.default_rng(0).random((9, 2)) * [1.3, 0.7]
+    for periodic in (True, False):
+        kwargs = {"grid_size": [23, 17], "size": [1.3, 0.7], "periodic": periodic}
+        vor = DiscreteVoronoi(seeds, chunk_size=50, **kwargs)
+        coords, _ = get_coordinate_grid(kwargs["size"], kwargs["grid_size"])
+        seed_data = vor.seeds_periodic if periodic else seeds
+        dist = euclidean_distance_matrix(coords.reshape(-1, 2), seed_data)
+        expected = np.argmin(dist, axis=1)
+        if periodic:
+            expected = vor.seeds_periodic_mapping[expected]
+        assert np.array_equal(vor.voxel_assignment_flat, expected)
+        assert np.array_equal(
+            DiscreteVoronoi(seeds, use_kdtree=True, **kwargs).voxel_assignment,
+            vor.voxel_assignment,
+        )
+
+
+def test_get_block_mode():
+    arr = np.array(
+        [
+            [0, 1, 2, 3],
+            [1, 1, 3, 2],
+            [4, 5, 6, 6],
+            [5, 4, 7, 7],
+        ]
+    )
+    # ties are resolved in favour of the smallest value:
+    assert np.array_equal(get_block_mode(arr, [2, 2]), [[1, 2], [4, 6]])
+    assert np.array_equal(get_block_mode(arr, [1, 4]), [[0], [1], [6], [7]])
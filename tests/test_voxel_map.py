@@ -0,0 +1,366 @@
+import h5py
+import numpy as np
+import pytest
+from scipy.spatial import KDTree
+
+from cipher_parse.cipher_input import compress_1D_array_string
+from cipher_parse.voxel_map import (
+    ChunkedVoxelMap,
+    VoxelMap,
+    encode_pair_keys,
+    decode_pair_keys,
+)
+from cipher_parse.discrete_voronoi import (
+    DiscreteVoronoi,
+    PowerVoronoi,
+    get_coordinate_grid,
+)
+
+
+def get_voronoi(grid_size=[24, 24], num_regions=10, is_periodic=True, random_seed=1):
+    return DiscreteVoronoi.from_random(
+        size=[1] * len(grid_size),
+        grid_size=grid_size,
+        num_regions=num_regions,
+        is_periodic=is_periodic,
+        random_seed=random_seed,
+    )
+
+
+def test_pair_keys_round_trip():
+    pairs = np.array([[0, 3, 7, 2], [5, 1, 7, 0]])
+    assert np.all(decode_pair_keys(encode_pair_keys(pairs, 8), 8) == pairs)
+
+
+def test_is_neighbour_pair_matches_neighbour_list():
+    vor = get_voronoi()
+    pairs = np.array([[i, j] for i in range(10) for j in range(10) if i != j])
+    expected = [np.any(np.all(pp[:, None] == vor.neighbour_list, axis=0)) for pp in pairs]
+    assert np.all(vor.is_neighbour_pair(pairs) == expected)
+
+
+def test_neighbour_attributes_computed_lazily():
+    vor = get_voronoi()
+    assert vor._neighbour_voxels is None
+    assert vor._neighbour_list is None
+    assert vor._num_regions is None
+
+    vor_pre = VoxelMap(
+        region_ID=vor.region_ID,
+        size=vor.size,
+        is_periodic=vor.is_periodic,
+        quiet=True,
+        precompute=True,
+    )
+    assert np.array_equal(vor.neighbour_list, vor_pre._neighbour_list)
+    assert np.array_equal(vor.neighbour_voxels, vor_pre._neighbour_voxels)
+    assert vor.num_regions == vor_pre._num_regions
+
+
+def test_neighbour_region_cached():
+    vor = get_voronoi(is_periodic=False)
+    assert vor.region_ID_above is vor.region_ID_above
+    assert np.array_equal(vor.region_ID_above[1:], vor.region_ID[:-1])
+    assert np.array_equal(vor.region_ID_above[0], vor.region_ID[0])
+    vor.clear_neighbour_region_cache()
+    assert not vor._neighbour_region
+
+
+def test_neighbour_list_shared_face_counts():
+    for is_periodic in (True, False):
+        vor = get_voronoi(grid_size=[10, 12, 8], is_periodic=is_periodic)
+        neighbours, counts = vor.get_neighbour_list(quiet=True, return_counts=True)
+        expected = {}
+        for axis in range(vor.dimension):
+            upper = np.roll(vor.region_ID, shift=-1, axis=axis)
+            lower = vor.region_ID
+            if not is_periodic:
+                upper = np.delete(upper, -1, axis=axis)
+                lower = np.delete(lower, -1, axis=axis)
+            for a, b in zip(lower.ravel(), upper.ravel()):
+                if a != b:
+                    for key in ((a, b), (b, a)):
+                        expected[key] = expected.get(key, 0) + 1
+        assert dict(zip(map(tuple, neighbours.T.tolist()), counts.tolist())) == expected
+
+
+def test_adjacency_graph_shared_area():
+    vor = get_voronoi(grid_size=[10, 12, 8])
+    graph = vor.adjacency_graph
+    neighbours, counts = vor.get_neighbour_list(quiet=True, return_counts=True)
+    assert np.array_equal(graph.get_edges(), neighbours)
+    for region in range(vor.num_regions):
+        assert np.array_equal(
+            graph.get_neighbours(region), neighbours[1, neighbours[0] == region]
+        )
+
+    # each face is normal to one axis, so its area depends on the axis:
+    face_areas = [np.prod(np.delete(vor.spacing, i)) for i in range(vor.dimension)]
+    area = graph.get_shared_area(neighbours.T)
+    assert np.all(area >= counts * min(face_areas) - 1e-12)
+    assert np.all(area <= counts * max(face_areas) + 1e-12)
+    assert np.allclose(area, graph.get_shared_area(neighbours[::-1].T))
+    assert np.all(graph.get_shared_area([[0, 0], [-1, 2], [0, 100]]) == 0)
+
+
+def get_interface_idx_brute_force(voxel_map, interface_map):
+    idx_all = []
+    for axis in range(voxel_map.dimension):
+        for shift in (1, -1):
+            neighbour = np.roll(voxel_map.region_ID, shift=shift, axis=axis)
+            idx_all.append(interface_map[voxel_map.region_ID, neighbour])
+    idx = np.max(idx_all, axis=0)
+    idx[voxel_map.region_ID_bulk] = -1
+    if not voxel_map.is_periodic:
+        for axis in range(voxel_map.dimension):
+            idx[(slice(None),) * axis + (0,)] = -1
+            idx[(slice(None),) * axis + (-1,)] = -1
+    return idx
+
+
+def test_get_interface_idx_chunked():
+    rng = np.random.default_rng(0)
+    interface_map = rng.integers(-1, 20, size=(10, 10))
+    interface_map = np.maximum(interface_map, interface_map.T)
+    for is_periodic in (True, False):
+        vor = get_voronoi(grid_size=[10, 12, 8], is_periodic=is_periodic)
+        expected = get_interface_idx_brute_force(vor, interface_map)
+        for chunk_size in (None, 1, 3):
+            interface_idx = vor.get_interface_idx(interface_map, chunk_size=chunk_size)
+            assert np.array_equal(interface_idx, expected)
+
+
+def get_chunked_voxel_maps(vor, tmp_path, chunk_size=3):
+    region_ID = vor.region_ID.astype(np.uint16)
+    path_raw = tmp_path / "region_ID.raw"
+    region_ID.tofile(path_raw)
+    path_HDF5 = tmp_path / "region_ID.hdf5"
+    with h5py.File(path_HDF5, "w") as f:
+        f.create_dataset("region_ID", data=region_ID)
+
+    kwargs = {"size": vor.size, "is_periodic": vor.is_periodic, "chunk_size": chunk_size}
+    return [
+        ChunkedVoxelMap.from_memmap(path_raw, region_ID.shape, region_ID.dtype, **kwargs),
+        ChunkedVoxelMap.from_HDF5(path_HDF5, "region_ID", **kwargs),
+    ]
+
+
+def test_chunked_voxel_map_equivalence(tmp_path):
+    interface_map = np.arange(100).reshape(10, 10)
+    interface_map = np.maximum(interface_map, interface_map.T)
+    for is_periodic in (True, False):
+        vor = get_voronoi(grid_size=[10, 12, 8], is_periodic=is_periodic)
+        for vox_map in get_chunked_voxel_maps(vor, tmp_path):
+            assert vox_map.num_regions == vor.num_regions
+            assert np.array_equal(vox_map.neighbour_list, vor.neighbour_list)
+            assert np.allclose(vox_map.adjacency_graph.area, vor.adjacency_graph.area)
+            assert np.array_equal(
+                vox_map.get_region_num_voxels(),
+                np.bincount(vor.region_ID.reshape(-1)),
+            )
+            out = np.zeros(vor.shape, dtype=interface_map.dtype)
+            vox_map.get_interface_idx(interface_map, out=out)
+            assert np.array_equal(out, vor.get_interface_idx(interface_map))
+            assert vox_map.get_region_ID_string() == compress_1D_array_string(
+                vor.region_ID.flatten(order="F") + 1
+            )
+            vox_map.close()
+
+
+def test_threaded_slab_kernels():
+    interface_map = np.arange(100).reshape(10, 10)
+    interface_map = np.maximum(interface_map, interface_map.T)
+    for is_periodic in (True, False):
+        vor = get_voronoi(grid_size=[10, 12, 8], is_periodic=is_periodic)
+        vox_map = VoxelMap(
+            region_ID=vor.region_ID,
+            size=vor.size,
+            is_periodic=is_periodic,
+            quiet=True,
+            num_threads=4,
+        )
+        assert len(vox_map.get_slab_ranges()) == 4
+        assert np.array_equal(vox_map.neighbour_list, vor.neighbour_list)
+        assert np.array_equal(vox_map.region_ID_bulk, vor.region_ID_bulk)
+        assert np.array_equal(
+            vox_map.get_interface_idx(interface_map),
+            get_interface_idx_brute_force(vor, interface_map),
+        )
+
+
+def test_map_slabs_bounds_slabs_in_flight():
+    vor = get_voronoi(grid_size=[10, 12, 8], is_periodic=False)
+    vox_map = VoxelMap(
+        region_ID=vor.region_ID,
+        size=vor.size,
+        is_periodic=False,
+        quiet=True,
+        num_threads=2,
+    )
+    started = []
+    results = vox_map.map_slabs(lambda start, stop: started.append(start) or start, 1)
+    for num_consumed, start in enumerate(results, start=1):
+        assert start == num_consumed - 1
+        assert len(started) <= num_consumed + vox_map.num_threads
+    assert len(started) == vor.shape[0]
+
+
+def test_discrete_voronoi_chunked_tessellation():
+    size, grid_size = [1.3, 0.7, 2.0], [9, 11, 7]
+    seeds = DiscreteVoronoi.get_random_seeds(8, size, random_seed=1)
+    coords, _ = get_coordinate_grid(size, grid_size)
+    for is_periodic in (True, False):
+        tree = KDTree(seeds, boxsize=size if is_periodic else None)
+        expected = tree.query(coords.reshape(-1, 3))[1].reshape(coords.shape[:-1])
+        for chunk_size in (None, 1, 4):
+            vor = DiscreteVoronoi(
+                region_seeds=seeds,
+                grid_size=grid_size,
+                size=size,
+                is_periodic=is_periodic,
+                chunk_size=chunk_size,
+            )
+            assert vor.region_ID.dtype == np.uint8
+            assert np.array_equal(vor.region_ID, expected)
+
+
+def test_get_unique_random_seeds():
+    size, grid_size = np.array([1.3, 0.7]), np.array([6, 5])
+    seeds = DiscreteVoronoi.get_unique_random_seeds(30, size, grid_size, random_seed=0)
+    seeds_grid = (grid_size * seeds / size).astype(int)
+    assert np.unique(seeds_grid, axis=0).shape[0] == 30
+    assert np.all(
+        seeds
+        == DiscreteVoronoi.get_unique_random_seeds(30, size, grid_size, random_seed=0)
+    )
+
+
+def test_discrete_voronoi_hierarchical_tessellation():
+    for grid_size, size in (([33, 20, 12], [1.3, 0.7, 2.0]), ([40, 27], [1.0, 0.6])):
+        seeds = DiscreteVoronoi.get_unique_random_seeds(20, size, grid_size, 1)
+        for is_periodic in (True, False):
+            kwargs = {
+                "region_seeds": seeds,
+                "grid_size": grid_size,
+                "size": size,
+                "is_periodic": is_periodic,
+            }
+            assert np.array_equal(
+                DiscreteVoronoi(**kwargs, hierarchical=True).region_ID,
+                DiscreteVoronoi(**kwargs).region_ID,
+            )
+
+
+def test_discrete_voronoi_seed_editing():
+    for grid_size, size in (([30, 21, 12], [1.3, 0.7, 2.0]), ([40, 27], [1.0, 0.6])):
+        for is_periodic in (True, False):
+            rng = np.random.default_rng(1)
+            seeds = rng.random((12, len(size))) * size
+            vor = DiscreteVoronoi(seeds, grid_size, size, is_periodic=is_periodic)
+            vor.neighbour_list  # also updated incrementally
+            vor.region_num_voxels
+
+            seeds = np.vstack([seeds, rng.random(len(size)) * size])
+            vor.add_seed(seeds[-1])
+            seeds[3] = rng.random(len(size)) * size
+            vor.move_seed(3, seeds[3])
+            seeds = np.delete(seeds, 5, axis=0)
+            vor.remove_seed(5)
+
+            vor_new = DiscreteVoronoi(seeds, grid_size, size, is_periodic=is_periodic)
+            assert np.array_equal(vor.region_ID, vor_new.region_ID)
+            assert np.array_equal(vor.neighbour_list, vor_new.neighbour_list)
+            assert np.allclose(vor.adjacency_graph.area, vor_new.adjacency_graph.area)
+            assert np.array_equal(vor.region_num_voxels, vor_new.region_num_voxels)
+
+
+def test_power_voronoi_equal_brute_force():
+    size, grid_size = np.array([1.3, 0.7]), [40, 27]
+    seeds = DiscreteVoronoi.get_unique_random_seeds(20, size, grid_size, 1)
+    radii = np.random.default_rng(0).random(20) * 0.2
+    coords, _ = get_coordinate_grid(size, grid_size)
+    for is_periodic in (True, False):
+        delta = np.abs(coords[..., None, :] - seeds)
+        if is_periodic:
+            delta = np.minimum(delta, size - delta)
+        labels = np.argmin(np.sum(delta**2, axis=-1) - radii**2, axis=-1)
+        _, labels = np.unique(labels, return_inverse=True)  # empty regions removed
+
+        kwargs = {
+            "region_seeds": seeds,
+            "region_radii": radii,
+            "grid_size": grid_size,
+            "size": size,
+            "is_periodic": is_periodic,
+        }
+        vor = PowerVoronoi(**kwargs)
+        assert np.array_equal(vor.region_ID, labels.reshape(vor.shape))
+        assert vor.num_seeds == vor.num_regions
+        assert np.array_equal(
+            PowerVoronoi(**kwargs, hierarchical=True).region_ID, vor.region_ID
+        )
+
+    # equal radii give the Voronoi tessellation:
+    assert np.array_equal(
+        PowerVoronoi(seeds, np.full(20, 0.1), grid_size, size).region_ID,
+        DiscreteVoronoi(seeds, grid_size, size).region_ID,
+    )
+
+
+def test_power_voronoi_random_radii_target_distribution():
+    radii = PowerVoronoi.get_random_radii(
+        20_000, {"mean": 2.0, "std": 0.5}, random_seed=1
+    )
+    assert np.isclose(radii.mean(), 2.0, rtol=0.02)
+    assert np.isclose(radii.std(), 0.5, rtol=0.05)
+
+    radii = PowerVoronoi.get_random_radii(
+        20_000, {"type": "lognormal", "mu": 0.5, "sigma": 0.2}, random_seed=1
+    )
+    assert np.isclose(np.log(radii).mean(), 0.5, atol=0.01)
+
+    target = [0.1, 0.2, 0.4]
+    radii = PowerVoronoi.get_random_radii(
+        100, {"type": "empirical", "radii": target}, random_seed=1
+    )
+    assert set(radii) == set(target)
+
+    for size_distribution in ({"mean": 2.0}, {"type": "gamma", "mean": 2.0}):
+        with pytest.raises(ValueError):
+            PowerVoronoi.get_random_radii(10, size_distribution)
+
+
+def test_power_voronoi_seeds_not_editable():
+    vor = PowerVoronoi.from_random(
+        [1, 1], [16, 16], 5, size_distribution={"mean": 0.1, "std": 0.02}
+    )
+    with pytest.raises(TypeError):
+        vor.move_seed(0, [0.5, 0.5])
+
+
+def test_seeds_not_editable_with_region_data():
+    vor = DiscreteVoronoi.from_random([1, 1], [16, 16], num_regions=5, random_seed=1)
+    vor = DiscreteVoronoi(vor.seeds, [16, 16], region_data={"type": np.arange(5)})
+    with pytest.raises(ValueError, match="region_data"):
+        vor.add_seed([0.5, 0.5])
+    with pytest.raises(ValueError, match="region_data"):
+        vor.move_seed(0, [0.5, 0.5])
+    with pytest.raises(ValueError, match="region_data"):
+        vor.remove_seed(0)
+
+
+def test_lazy_neighbour_attributes_quiet(capsys):
+    vor = DiscreteVoronoi.from_random([1, 1], [16, 16], num_regions=5, random_seed=1)
+    capsys.readouterr()
+    vor.neighbour_voxels
+    vor.neighbour_list
+    assert capsys.readouterr().out == ""
+
+
+def test_get_voxel_coordinates_equal_coordinates():
+    for grid_size, size in (([12, 12, 12], [1.3, 0.7, 2.0]), ([16, 16], [1.0, 0.6])):
+        vor = DiscreteVoronoi.from_random(size, grid_size, num_regions=5, random_seed=1)
+        voxel_idx = np.nonzero(vor.region_ID == 2)
+        coords = vor.get_voxel_coordinates(voxel_idx)
+        assert vor._coordinates is None
+        assert np.array_equal(coords, vor.coordinates[voxel_idx])